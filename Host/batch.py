@@ -0,0 +1,88 @@
+"""
+Пакетное декодирование Linear11/Linear16 на хосте: длинные записи телеметрии
+(журнал `log`, поток `monitor`). Скалярные функции decode.py остаются эталонной
+реализацией; на устройство модуль не копируется.
+"""
+import os
+import sys
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Source"))
+
+from commands import DEC_LINEAR11, DEC_LINEAR16
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # хост без NumPy: используется табличная реализация на array
+
+# Множитель 2^N для каждого значения 5-битного поля экспоненты Linear11 (индекс - raw >> 11)
+LINEAR11_SCALE = tuple(2.0 ** (n - 32 if n & 0x10 else n) for n in range(32))
+# Знаковая 11-битная мантисса для каждого значения raw & 0x7FF
+_MANTISSA11 = tuple(y - 2048 if y & 0x400 else y for y in range(2048))
+
+
+def _words(raw):
+    """uint16 little-endian из массива NumPy, array('H') или буфера/memoryview."""
+    if np is not None:
+        if isinstance(raw, np.ndarray):
+            return raw.astype(np.uint16, copy=False)
+        return np.frombuffer(raw, dtype="<u2")
+    if isinstance(raw, array) and raw.typecode == "H":
+        return raw
+    words = array("H")
+    words.frombytes(bytes(raw))
+    return words
+
+
+def decode_linear11_batch(raw):
+    """
+    Linear11 для массива сырых слов. Возвращает float64 ndarray (или array('d') без NumPy).
+    """
+    words = _words(raw)
+    if np is not None:
+        mantissa = ((words & 0x7FF).astype(np.int32) ^ 0x400) - 0x400
+        return mantissa * np.asarray(LINEAR11_SCALE)[words >> 11]
+    scale = LINEAR11_SCALE
+    mant = _MANTISSA11
+    return array("d", [mant[w & 0x7FF] * scale[w >> 11] for w in words])
+
+
+def decode_linear16_batch(raw, exponent):
+    """
+    Linear16 с фиксированным экспонентом (мантисса знаковая, как в linear16_to_float).
+    """
+    words = _words(raw)
+    scale = 2.0 ** exponent
+    if np is not None:
+        return words.view(np.int16) * scale
+    return array("d", [(w - 0x10000 if w & 0x8000 else w) * scale for w in words])
+
+
+def decode_columns(raw, formats, exponents=None):
+    """
+    Декодирует запись из N отсчётов по C каналов (слова чередуются по каналам).
+    :param raw: ndarray (N, C) / (N*C,) или буфер little-endian слов
+    :param formats: идентификатор декодера для каждого канала
+                    (DEC_LINEAR11, DEC_LINEAR16, остальные - сырое слово как число)
+    :param exponents: экспонент VOUT_MODE для каналов DEC_LINEAR16
+    :return: список колонок float
+    """
+    words = _words(raw)
+    columns = len(formats)
+    exponents = exponents or [0] * columns
+    if np is not None:
+        words = words.reshape(-1, columns)
+    result = []
+    for c in range(columns):
+        col = words[:, c] if np is not None else words[c::columns]
+        fmt = formats[c]
+        if fmt == DEC_LINEAR11:
+            result.append(decode_linear11_batch(col))
+        elif fmt == DEC_LINEAR16:
+            result.append(decode_linear16_batch(col, exponents[c]))
+        elif np is not None:
+            result.append(col.astype(np.float64))
+        else:
+            result.append(array("d", col))
+    return result
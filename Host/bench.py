@@ -0,0 +1,423 @@
+"""
+Бенчмарки тестера на эмуляторе шины.
+
+Запуск:  python3 Host/bench.py [имя ...]
+Без аргументов выполняются все бенчмарки из BENCHMARKS.
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import sim
+from pec import crc8, crc8_bitwise
+from discovery import CapabilityStore
+from calibrate import BusProfileStore
+from pmbus_manager import PMBusManager
+from commands import DEC_LINEAR11, DEC_LINEAR16
+
+FREQS = (50000, 100000, 400000)
+CYCLES = 20
+
+
+def make_manager(freq, psu=None):
+    bus = sim.SimI2C([psu or sim.SimPSU()], freq=freq)
+    manager = PMBusManager(bus)
+    store_dir = tempfile.mkdtemp()
+    manager.capabilities = CapabilityStore(os.path.join(store_dir, "capabilities.json"))
+    manager.bus_profiles = BusProfileStore(os.path.join(store_dir, "bus_profiles.json"))
+    manager.set_pmbus_addr(0x58)
+    return manager, bus
+
+
+class NullWriter(io.TextIOBase):
+    def write(self, text):
+        return len(text)
+
+
+def measure(bus, func, cycles=CYCLES):
+    """
+    Выполняет func cycles раз (вывод подавляется) и возвращает словарь:
+    транзакций за цикл, расчётное время шины за цикл (мкс),
+    транзакций в секунду процессорного времени хоста,
+    пиковый объём временных выделений памяти за цикл (байт).
+    """
+    sink = NullWriter()
+    with contextlib.redirect_stdout(sink):
+        func()  # прогрев: заполнение кэшей, импорт
+        bus.reset_counters()
+        start = time.perf_counter()
+        for _ in range(cycles):
+            func()
+        elapsed = time.perf_counter() - start
+        transactions, bus_us = bus.transactions, bus.bus_time_us
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        func()
+        peak = tracemalloc.get_traced_memory()[1] - base
+        tracemalloc.stop()
+    return {
+        "tx": transactions / cycles,
+        "bus_us": bus_us / cycles,
+        "tx_per_s": transactions / elapsed if elapsed else 0.0,
+        "alloc": peak,
+    }
+
+
+def report(name, freq, result):
+    print(f"{name:<24} {freq // 1000:>4} kHz  tx/cycle {result['tx']:6.1f}  "
+          f"bus {result['bus_us'] / 1000:8.2f} ms  host {result['tx_per_s']:9.0f} tx/s  "
+          f"alloc {result['alloc']:7d} B")
+
+
+def bench_poll_params():
+    for freq in FREQS:
+        manager, bus = make_manager(freq)
+        report("poll_params", freq, measure(bus, manager.poll_params))
+
+
+def bench_statuses():
+    for freq in FREQS:
+        manager, bus = make_manager(freq)
+        report("decode_all_statuses", freq, measure(bus, manager.decode_all_statuses))
+
+
+def bench_faults():
+    for freq in FREQS:
+        manager, bus = make_manager(freq)
+        report("faults (healthy)", freq, measure(bus, manager.print_faults))
+    psu = sim.SimPSU()
+    psu.regs[0x79] = bytes([0x04, 0x04])  # TEMPERATURE + FANS
+    psu.regs[0x7D] = b"\x40"
+    psu.regs[0x81] = b"\x20"
+    for freq in FREQS:
+        manager, bus = make_manager(freq, psu)
+        report("faults (temp+fan)", freq, measure(bus, manager.print_faults))
+
+
+def bench_pec():
+    frames = {
+        "read word": bytes([0xB0, 0x8B, 0xB1, 0x00, 0x18]),
+        "block 16B": bytes([0xB0, 0x9A, 0xB1, 16]) + b"CRPS-1600W-12V-X",
+    }
+    loops = 20000
+    for name, frame in frames.items():
+        assert crc8(frame) == crc8_bitwise(frame)
+        start = time.perf_counter()
+        for _ in range(loops):
+            crc8_bitwise(frame)
+        bitwise = (time.perf_counter() - start) / loops * 1e6
+        start = time.perf_counter()
+        for _ in range(loops):
+            crc8(frame)
+        table = (time.perf_counter() - start) / loops * 1e6
+        print(f"PEC {name:<12} bitwise {bitwise:6.2f} us  table {table:6.2f} us  x{bitwise / table:4.1f}")
+    for freq in FREQS:
+        manager, bus = make_manager(freq)
+        manager.device.pec = True
+        report("poll_params (PEC)", freq, measure(bus, manager.poll_params))
+
+
+def traced_delta(func):
+    """Прирост памяти (байт) за вызов func по tracemalloc без учёта самого tracemalloc."""
+    tracemalloc.start()
+    ignore = (tracemalloc.Filter(False, tracemalloc.__file__),)
+    tracemalloc.take_snapshot().filter_traces(ignore)  # прогрев: компиляция шаблона фильтра
+    before = tracemalloc.take_snapshot().filter_traces(ignore)
+    func()
+    after = tracemalloc.take_snapshot().filter_traces(ignore)
+    tracemalloc.stop()
+    return sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+
+def bench_heap():
+    """
+    Остаток выделенной памяти за цикл (на хосте tracemalloc видит только
+    неосвобождённые объекты; на устройстве params выводит прирост gc.mem_alloc).
+    """
+    from status import read_fault_tree
+    traced_delta(lambda: None)
+    for pec in (False, True):
+        manager, bus = make_manager(100000)
+        manager.device.pec = pec
+        reader = manager.snapshot_reader
+        with contextlib.redirect_stdout(NullWriter()):
+            manager.poll_params()
+        reader.capture()
+        read_fault_tree(manager.device)  # прогрев: выделение буферов устройства
+        bus_phase = traced_delta(reader.read_bus)
+        cycle = traced_delta(reader.capture)
+        faults = traced_delta(lambda: read_fault_tree(manager.device))
+        print(f"heap PEC={'on ' if pec else 'off'}  snapshot bus phase {bus_phase:5d} B  "
+              f"capture {cycle:5d} B  fault tree (healthy) {faults} B")
+
+
+def bench_decode_batch():
+    """
+    Пакетное декодирование Linear11/Linear16 (Host/batch.py) против скалярных функций:
+    сначала проверка совпадения по всем 65536 значениям для каждой доступной
+    реализации (NumPy и array), затем скорость.
+    """
+    from array import array
+    import batch
+    import decode
+
+    all_words = array("H", range(65536))
+    numpy = batch.np
+    backends = (("NumPy", numpy), ("array", None)) if numpy is not None else (("array", None),)
+    for name, backend in backends:
+        batch.np = backend
+        try:
+            values = batch.decode_linear11_batch(all_words)
+            for w in range(65536):
+                assert values[w] == decode.decode_linear_format(w & 0xFF, w >> 8), (name, hex(w))
+            for exponent in range(-16, 16):
+                values = batch.decode_linear16_batch(all_words.tobytes(), exponent)
+                for w in range(65536):
+                    assert values[w] == decode.linear16_to_float(w, exponent), (name, hex(w), exponent)
+            columns = batch.decode_columns(all_words.tobytes(), (DEC_LINEAR11, DEC_LINEAR16), (0, -9))
+            for i, w in enumerate(all_words[1::2]):
+                assert columns[1][i] == decode.linear16_to_float(w, -9), (name, hex(w))
+        finally:
+            batch.np = numpy
+        print(f"decode batch: equivalence OK on 65536 raw values ({name})")
+    if numpy is None:
+        print("decode batch: NumPy not installed, NumPy branch not checked")
+
+    samples = array("H", (all_words * 16)[:1000000])
+    buf = samples.tobytes()
+    start = time.perf_counter()
+    for w in samples:
+        decode.decode_linear_format(w & 0xFF, w >> 8)
+    scalar = time.perf_counter() - start
+    start = time.perf_counter()
+    batch.decode_linear11_batch(buf)
+    elapsed = time.perf_counter() - start
+    print(f"linear11 1M samples   scalar {scalar * 1000:8.1f} ms  batch {elapsed * 1000:8.1f} ms  "
+          f"x{scalar / elapsed:5.1f}")
+    start = time.perf_counter()
+    for w in samples:
+        decode.linear16_to_float(w, -9)
+    scalar = time.perf_counter() - start
+    start = time.perf_counter()
+    batch.decode_linear16_batch(buf, -9)
+    elapsed = time.perf_counter() - start
+    print(f"linear16 1M samples   scalar {scalar * 1000:8.1f} ms  batch {elapsed * 1000:8.1f} ms  "
+          f"x{scalar / elapsed:5.1f}")
+
+
+def bench_protocol():
+    """Бинарный протокол через socketpair: последовательные запросы против конвейера."""
+    import asyncio
+    import client
+
+    async def run():
+        cli, bus = await client.connect_simulated()
+        count = 500
+        start = time.perf_counter()
+        for _ in range(count):
+            await cli.raw_read(0x58, 0x88, 2)
+        sequential = time.perf_counter() - start
+        start = time.perf_counter()
+        await asyncio.gather(*(cli.raw_read(0x58, 0x88, 2) for _ in range(count)))
+        pipelined = time.perf_counter() - start
+        await cli.close()
+        print(f"protocol {count} reads   sequential {sequential * 1000:7.1f} ms  "
+              f"pipelined {pipelined * 1000:7.1f} ms  x{sequential / pipelined:4.1f}")
+
+    asyncio.run(run())
+
+
+def bench_energy():
+    """
+    Средняя мощность за окно 1 с: два чтения READ_EIN/READ_EOUT
+    против опроса READ_PIN/READ_POUT с частотой 100 Гц.
+    Счётчики блока переполняются внутри окна. Последняя строка - блок со своими
+    коэффициентами COEFFICIENTS (m=4, b=0, R=-1: отсчёт 0.4 Вт).
+    """
+    from commands import READ_PIN, READ_POUT
+    from energy import EnergyWindow
+
+    for freq, coeffs in [(freq, None) for freq in FREQS] + [(100000, (4, 0, -1))]:
+        psu = sim.SimPSU()
+        if coeffs is not None:
+            psu.coefficients = {0x86: coeffs, 0x87: coeffs}
+        now = [0.0]
+        psu.clock = lambda: now[0]
+        psu.t0 = 0.0
+        psu.samples_offset = (1 << 24) - 300
+        manager, bus = make_manager(freq, psu)
+        bus.reset_counters()
+        first = manager.energy.sample()
+        now[0] = 1.0
+        window = EnergyWindow(first, manager.energy.sample())
+        energy_tx, energy_us = bus.transactions, bus.bus_time_us
+        bus.reset_counters()
+        for _ in range(100):
+            manager.device.read_bytes(READ_PIN.code, READ_PIN.size)
+            manager.device.read_bytes(READ_POUT.code, READ_POUT.size)
+        print(f"energy {freq // 1000:>4} kHz  accumulators {energy_tx:3d} tx {energy_us / 1000:6.2f} ms  "
+              f"PIN {window.pin:6.1f} W  POUT {window.pout:6.1f} W  eff {window.efficiency * 100:5.1f} %  |  "
+              f"polling 100 Hz {bus.transactions:3d} tx {bus.bus_time_us / 1000:6.2f} ms  "
+              f"coeffs {first.coeffs[0]}")
+
+
+def bench_pages():
+    """Четыре канала многоканального блока: PAGE_PLUS_READ против записи PAGE на каждую страницу."""
+    from commands import PAGE_CMDS
+    from snapshot import PagedReader
+
+    for freq in FREQS:
+        for page_plus, name in ((True, "pages page_plus"), (False, "pages switch")):
+            manager, bus = make_manager(freq, sim.SimPSU(pages=sim.rail_pages(4)))
+            reader = PagedReader(manager.device, range(4), PAGE_CMDS, page_plus)
+            report(name, freq, measure(bus, reader.capture))
+
+
+def bench_eeprom():
+    """
+    Чтение образа FRU: побайтно через read_bytes (как команда read) против
+    последовательного чтения Eeprom и повторной загрузки из кэша по подписи.
+    Скорость - байт в секунду расчётного времени шины.
+    """
+    from eeprom import Eeprom, FruStore
+    from pmbus import PMBusDevice
+
+    for size, page in ((256, 8), (2048, 16)):
+        for freq in FREQS:
+            chip = sim.SimEEPROM(size=size, page=page, data=sim.fru_image(size=size))
+            bus = sim.SimI2C([chip], freq=freq)
+            eeprom = Eeprom(bus, 0x50, size, page)
+            device = PMBusDevice(bus)
+            store = FruStore()
+            store.load(eeprom)  # заполнение кэша образов
+
+            def per_byte():
+                for offset in range(size):
+                    device.addr, mem = eeprom.locate(offset)
+                    device.read_bytes(mem, 1)
+
+            rates = []
+            for load in (per_byte, lambda: eeprom.read(0, size), lambda: store.load(eeprom)):
+                bus.reset_counters()
+                load()
+                rates.append((bus.transactions, size / (bus.bus_time_us / 1e6)))
+            bus.reset_counters()
+            eeprom.write(0, bytes(chip.data))
+            print(f"eeprom {size:>4} B {freq // 1000:>4} kHz  "
+                  + "  ".join(f"{name} {tx:5d} tx {rate:9.0f} B/s" for name, (tx, rate)
+                              in zip(("per-byte", "sequential", "cached"), rates))
+                  + f"  | write {size // page} pages {eeprom.polls} polls {bus.bus_time_us / 1000:6.1f} ms")
+
+
+def bench_calibrate():
+    """
+    Шина со смешанными блоками: 400 кГц, 100 кГц (NACK выше) и блок с битовыми
+    ошибками выше 100 кГц. Групповой опрос на базовых 50 кГц против частот из профилей.
+    """
+    def mixed_bus():
+        fast = sim.SimPSU(0x58)
+        slow = sim.SimPSU(0x59)
+        slow.max_freq = 100000
+        noisy = sim.SimPSU(0x5A)
+        noisy.regs[0x9A] = sim.block("CRPS-800W-12V")
+        noisy.marginal_freq = 100000
+        noisy.bit_error_rate = 0.2
+        return [fast, slow, noisy]
+
+    for profiles in (False, True):
+        psus = mixed_bus()
+        manager, bus = make_manager(50000, psus[0])
+        for psu in psus[1:]:
+            bus.add(psu)
+        start = time.perf_counter()
+        rates = []
+        for psu in psus:
+            target = manager.fleet.add(0, psu.addr)
+            if profiles:
+                manager.apply_fleet_profile(target)
+            rates.append(f"0x{psu.addr:02X}@{(target.freq or 50000) // 1000}k")
+        setup = time.perf_counter() - start
+        manager.restore_bus_rates()
+        clock = manager.bus_clocks[0]
+        switches = clock.switches
+        result = measure(bus, manager.fleet.cycle)
+        name = "fleet per-target rate" if profiles else "fleet base rate"
+        report(name, 50000, result)
+        print(f"  {' '.join(rates)}  switches/cycle {(clock.switches - switches) / (CYCLES + 2):.1f}  "
+              f"setup {setup * 1000:.0f} ms")
+
+
+def bench_logger():
+    """
+    Журнал телеметрии: запись на каждую запись (буфер размером с запись) против
+    записи секторами по 4 КБ; затем файл читается обратно через Host/logread.py
+    и декодированные колонки сверяются со скалярным decode_value.
+    """
+    from logger import FlashLogger, LOG_CMDS, RECORD_HEAD
+    from logread import TelemetryLog
+    from decode import decode_value, vout_exponent
+
+    records = 1000
+    record_size = RECORD_HEAD + 2 * len(LOG_CMDS)
+    path = os.path.join(tempfile.mkdtemp(), "telemetry_000.bin")
+    for sector in (record_size, 4096):
+        manager, bus = make_manager(100000)
+        logger = FlashLogger(LOG_CMDS, path, period_ms=100, sector=sector, max_bytes=0)
+        bus.reset_counters()
+        start = time.perf_counter()
+        for i in range(records):
+            logger.log(manager.device, i & 1)  # один адрес на двух шинах
+        elapsed = time.perf_counter() - start
+        tail = 1 if logger.fill else 0
+        logger.close()
+        writes = logger.sectors + tail
+        print(f"logger sector {sector:>4} B  {records} x {logger.record_size} B  writes {writes:5d}  "
+              f"{logger.written / writes:7.0f} B/write  tx/record {bus.transactions / records:4.1f}  "
+              f"host {records / elapsed:7.0f} records/s  longest write {logger.max_stall_us} us")
+    with TelemetryLog(path) as log:
+        assert log.count == records
+        assert sum(int(bus) for bus in log.column("bus")) == records // 2
+        modes = log.column("vout_mode")
+        mismatches = 0
+        for cmd, name in zip(log.cmds, log.names):
+            word = int(log.column(name)[0])
+            expected = decode_value(cmd, bytes((word & 0xFF, word >> 8)), vout_exponent(int(modes[0])))
+            if abs(log.values(name)[0] - expected) > 1e-9:
+                mismatches += 1
+        start = time.perf_counter()
+        for name in log.names:
+            log.values(name)
+        decode = time.perf_counter() - start
+        print(f"logread {log.count} records, {len(log.names)} channels decoded in {decode * 1000:.1f} ms "
+              f"({'NumPy' if log.records is not None else 'array'}), mismatches {mismatches}")
+        del modes
+
+
+BENCHMARKS = {
+    "poll_params": bench_poll_params,
+    "statuses": bench_statuses,
+    "faults": bench_faults,
+    "pec": bench_pec,
+    "heap": bench_heap,
+    "decode_batch": bench_decode_batch,
+    "protocol": bench_protocol,
+    "energy": bench_energy,
+    "pages": bench_pages,
+    "eeprom": bench_eeprom,
+    "calibrate": bench_calibrate,
+    "logger": bench_logger,
+}
+
+
+def main(names):
+    for name in names or BENCHMARKS:
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
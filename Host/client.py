@@ -0,0 +1,177 @@
+"""
+Асинхронный клиент бинарного протокола тестера (команда `binary`).
+
+Запросы нумеруются (SEQ 0..255) и отправляются без ожидания ответа
+на предыдущие; ответы сопоставляются с запросами по SEQ.
+
+    client = await open_serial("/dev/ttyACM0")
+    vin, iin, pout = await asyncio.gather(
+        client.read(0x58, "READ_VIN"), client.read(0x58, "READ_IIN"), client.read(0x58, "READ_POUT"))
+
+Для проверки без устройства: python3 Host/client.py (эмулятор через socketpair).
+"""
+import asyncio
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Source"))
+
+from commands import BY_CODE, BY_NAME, VOUT_MODE, DEC_LINEAR16
+from decode import decode_value, vout_exponent
+from protocol import (SYNC, HEADER, OP_PING, OP_RAW_READ, OP_PEC_READ, OP_READ_CMD,
+                      OP_SNAPSHOT, OP_EXIT, ST_OK, encode_frame)
+
+
+class ProtocolError(Exception):
+    def __init__(self, status, op):
+        super().__init__(f"request 0x{op:02X} failed with status {status}")
+        self.status = status
+        self.op = op
+
+
+class PMBusClient:
+    def __init__(self, reader, writer, max_in_flight=128):
+        self.reader = reader
+        self.writer = writer
+        self.pending = {}
+        self.next_seq = 0
+        self.slots = asyncio.Semaphore(max_in_flight)
+        self.task = asyncio.ensure_future(self._receive())
+        self.exponents = {}
+
+    async def close(self):
+        try:
+            await self.request(OP_EXIT)
+        finally:
+            self.task.cancel()
+            self.writer.close()
+
+    async def _receive(self):
+        try:
+            while True:
+                await self.reader.readuntil(SYNC)
+                length, seq, status = struct.unpack(HEADER, await self.reader.readexactly(4))
+                payload = await self.reader.readexactly(length)
+                future = self.pending.pop(seq, None)
+                if future is not None and not future.done():
+                    future.set_result((status, payload))
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError(str(e)))
+            self.pending.clear()
+
+    def _allocate_seq(self):
+        for _ in range(256):
+            seq = self.next_seq
+            self.next_seq = (seq + 1) & 0xFF
+            if seq not in self.pending:
+                return seq
+        raise RuntimeError("no free sequence numbers")
+
+    async def request(self, op, payload=b""):
+        async with self.slots:
+            seq = self._allocate_seq()
+            future = asyncio.get_running_loop().create_future()
+            self.pending[seq] = future
+            self.writer.write(encode_frame(seq, op, payload))
+            status, data = await future
+        if status != ST_OK:
+            raise ProtocolError(status, op)
+        return data
+
+    async def ping(self):
+        return await self.request(OP_PING)
+
+    async def raw_read(self, addr, code, length):
+        return await self.request(OP_RAW_READ, bytes([addr, code, length]))
+
+    async def pec_read(self, addr, code, length):
+        return await self.request(OP_PEC_READ, bytes([addr, code, length]))
+
+    async def exponent(self, addr):
+        if addr not in self.exponents:
+            mode = await self.request(OP_READ_CMD, bytes([addr, VOUT_MODE.code]))
+            self.exponents[addr] = vout_exponent(mode[0])
+        return self.exponents[addr]
+
+    async def read(self, addr, name):
+        """Чтение команды по имени с декодированием по реестру commands.py."""
+        cmd = BY_NAME[name.lower()]
+        data = await self.request(OP_READ_CMD, bytes([addr, cmd.code]))
+        exponent = await self.exponent(addr) if cmd.decoder == DEC_LINEAR16 else None
+        return decode_value(cmd, data, exponent)
+
+    async def snapshot(self, addr):
+        """Возвращает (skew_us, {имя: значение}) одного снимка параметров."""
+        data = await self.request(OP_SNAPSHOT, bytes([addr]))
+        skew, count = struct.unpack_from("<IB", data)
+        raw = {}
+        pos = 5
+        for _ in range(count):
+            code, n = data[pos], data[pos + 1]
+            raw[code] = data[pos + 2:pos + 2 + n]
+            pos += 2 + n
+        mode = raw.get(VOUT_MODE.code)
+        exponent = vout_exponent(mode[0]) if mode else await self.exponent(addr)
+        values = {BY_CODE[code].name: decode_value(BY_CODE[code], value, exponent)
+                  for code, value in raw.items()}
+        return skew, values
+
+
+async def open_serial(port, baudrate=115200):
+    """Открывает USB CDC тестера (нужен pyserial-asyncio) и переводит его в бинарный режим."""
+    import serial_asyncio
+    reader, writer = await serial_asyncio.open_serial_connection(url=port, baudrate=baudrate)
+    writer.write(b"binary\r\n")
+    await reader.readuntil(b"Entering binary mode")
+    return PMBusClient(reader, writer)
+
+
+def serve_simulated(sock, devices=None):
+    """Запускает ProtocolServer на эмуляторе в отдельном потоке поверх сокета."""
+    import sim
+    from pmbus_manager import PMBusManager
+
+    bus = sim.SimI2C(devices or [sim.SimPSU()])
+    manager = PMBusManager(bus)
+    manager.set_pmbus_addr(0x58)
+
+    def run():
+        from protocol import ProtocolServer
+        with sock.makefile("rb") as rx, sock.makefile("wb") as tx:
+            ProtocolServer(manager, rx, tx).serve()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread, bus
+
+
+async def connect_simulated(devices=None):
+    host_sock, device_sock = socket.socketpair()
+    thread, bus = serve_simulated(device_sock, devices)
+    reader, writer = await asyncio.open_connection(sock=host_sock)
+    return PMBusClient(reader, writer), bus
+
+
+async def demo():
+    client, bus = await connect_simulated()
+    print("ping:", await client.ping())
+    names = ("READ_VIN", "READ_IIN", "READ_VOUT", "READ_IOUT", "READ_PIN", "READ_POUT", "STATUS_WORD")
+    values = await asyncio.gather(*(client.read(0x58, name) for name in names))
+    for name, value in zip(names, values):
+        print(f"{name:<12} {value}")
+    skew, snap = await client.snapshot(0x58)
+    print(f"snapshot: {len(snap)} values, skew {skew} us, MFR_MODEL={snap.get('MFR_MODEL')}")
+    start = time.perf_counter()
+    await asyncio.gather(*(client.raw_read(0x58, 0x88, 2) for _ in range(500)))
+    print(f"500 pipelined raw reads: {(time.perf_counter() - start) * 1000:.1f} ms")
+    await client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(demo())
@@ -0,0 +1,193 @@
+"""
+Чтение журнала телеметрии тестера (telemetry_NNN.bin, команда `log`) на хосте.
+
+Файл отображается в память (mmap); с NumPy записи доступны как структурированный
+массив поверх отображения, колонки - представления без копирования:
+
+    log = TelemetryLog("telemetry_000.bin")
+    vout = log.values("read_vout")          # float64, ошибки чтения - NaN
+    status = log.column("status_word")      # uint16, без копирования
+
+Без NumPy колонки слов - strided memoryview поверх того же отображения
+(little-endian хост), t_ms - копия в array('L').
+
+    python3 Host/logread.py telemetry_000.bin [--csv]
+"""
+import calendar
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Source"))
+
+from commands import command_by_code, DEC_LINEAR11, DEC_LINEAR16, DEC_DIRECT
+from decode import vout_exponent, linear16_to_float, direct_to_float
+from batch import np, decode_linear11_batch
+from logger import LOG_MAGIC, LOG_VERSION, HEADER_FORMAT, HEADER_SIZE, RECORD_HEAD, STATUS_ERROR
+
+# Поля заголовка записи: (имя, смещение, формат NumPy); байт 7 - резерв
+HEAD_FIELDS = (("t_ms", 0, "<u4"), ("bus", 4, "u1"), ("addr", 5, "u1"), ("vout_mode", 6, "u1"),
+               ("status_word", 8, "<u2"), ("errors", 10, "<u2"))
+
+
+class TelemetryLog:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, channels, self.record_size, self.sector, epoch_year,
+         self.start_time, self.period_ms) = struct.unpack_from(HEADER_FORMAT, self.map)
+        if magic != LOG_MAGIC or version != LOG_VERSION:
+            self.close()
+            raise ValueError(f"{path}: not a telemetry log (version {LOG_VERSION})")
+        codes = self.map[HEADER_SIZE:HEADER_SIZE + channels]
+        self.cmds = [command_by_code(code) for code in codes]
+        self.decoders = list(self.map[HEADER_SIZE + channels:HEADER_SIZE + 2 * channels])
+        self.names = [cmd.name.lower() for cmd in self.cmds]
+        # Время устройства: секунды от его эпохи (MicroPython на RP2040 - 2000 год)
+        self.epoch = calendar.timegm((epoch_year, 1, 1, 0, 0, 0))
+        self.offset = HEADER_SIZE + 2 * channels
+        # Неполная последняя запись (обрыв питания во время записи) отбрасывается
+        self.count = (len(self.map) - self.offset) // self.record_size
+        self.records = None
+        self.words = None
+        self.bytes = None
+        if np is not None:
+            self.records = np.ndarray((self.count,), dtype=self.dtype(), buffer=self.map, offset=self.offset)
+        else:
+            body = memoryview(self.map)[self.offset:self.offset + self.count * self.record_size]
+            self.bytes = body
+            self.words = body.cast("H")
+
+    def dtype(self):
+        names = [name for name, offset, fmt in HEAD_FIELDS] + self.names
+        formats = [fmt for name, offset, fmt in HEAD_FIELDS] + ["<u2"] * len(self.names)
+        offsets = [offset for name, offset, fmt in HEAD_FIELDS]
+        offsets += [RECORD_HEAD + 2 * i for i in range(len(self.names))]
+        return np.dtype({"names": names, "formats": formats, "offsets": offsets,
+                         "itemsize": self.record_size})
+
+    def close(self):
+        """Колонки-представления должны быть освобождены до закрытия отображения."""
+        self.records = self.words = self.bytes = None
+        try:
+            self.map.close()
+        except BufferError:
+            pass  # колонки ещё используются: отображение освободит сборщик мусора
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def start_unix(self):
+        return self.epoch + self.start_time
+
+    def column(self, name):
+        """Сырые значения поля записи (имя из HEAD_FIELDS или имя канала)."""
+        if self.records is not None:
+            return self.records[name]
+        stride = self.record_size
+        if name == "t_ms":
+            words = self.words[::stride // 2]
+            high = self.words[1::stride // 2]
+            return array("L", [lo | (hi << 16) for lo, hi in zip(words, high)])
+        for field, offset, fmt in HEAD_FIELDS:
+            if field == name:
+                if fmt == "u1":
+                    return self.bytes[offset::stride]
+                return self.words[offset // 2::stride // 2]
+        return self.words[RECORD_HEAD // 2 + self.names.index(name)::stride // 2]
+
+    def values(self, name):
+        """Значения канала в единицах измерения; неудачные чтения - NaN."""
+        index = self.names.index(name)
+        cmd = self.cmds[index]
+        decoder = self.decoders[index]
+        raw = self.column(name)
+        errors = self.column("errors")
+        bit = 1 << index
+        if np is not None:
+            words = raw.astype(np.uint16, copy=False)
+            if decoder == DEC_LINEAR11:
+                result = decode_linear11_batch(words)
+            elif decoder == DEC_LINEAR16:
+                exponent = (self.column("vout_mode") & 0x1F).astype(np.int8)
+                exponent[exponent > 15] -= 32
+                result = np.ldexp(words.view(np.int16).astype(np.float64), exponent)
+            elif decoder == DEC_DIRECT:
+                m, b, r = cmd.coeffs
+                result = (words.view(np.int16) * 10.0 ** -r - b) / m
+            else:
+                result = words.astype(np.float64)
+            result[(errors & bit) != 0] = np.nan
+            return result
+        if decoder == DEC_LINEAR11:
+            result = decode_linear11_batch(raw)
+        elif decoder == DEC_LINEAR16:
+            modes = self.column("vout_mode")
+            result = array("d", [linear16_to_float(w, vout_exponent(m)) for w, m in zip(raw, modes)])
+        elif decoder == DEC_DIRECT:
+            result = array("d", [direct_to_float(w, cmd.coeffs) for w in raw])
+        else:
+            result = array("d", raw)
+        for i, mask in enumerate(errors):
+            if mask & bit:
+                result[i] = math.nan
+        return result
+
+    def status_errors(self):
+        return sum(1 for mask in self.column("errors") if mask & STATUS_ERROR)
+
+
+def summary(log):
+    print(f"{log.path}: {log.count} records x {log.record_size} B, {len(log.cmds)} channels, "
+          f"period {log.period_ms} ms, sector {log.sector} B")
+    print(f"Session start (device clock): {log.start_unix()} s since 1970")
+    if not log.count:
+        return
+    t_ms = log.column("t_ms")
+    print(f"Duration: {(t_ms[-1] - t_ms[0]) / 1000:.1f} s")
+    units = {}
+    for unit in zip(log.column("bus"), log.column("addr")):
+        unit = (int(unit[0]), int(unit[1]))
+        units[unit] = units.get(unit, 0) + 1
+    print("Units: " + ", ".join(f"I2C{bus} 0x{addr:02X} ({n})" for (bus, addr), n in sorted(units.items())))
+    status = log.column("status_word")
+    print(f"Records with STATUS_WORD != 0: {sum(1 for word in status if word)}, "
+          f"STATUS_WORD read errors: {log.status_errors()}")
+    for name in log.names:
+        valid = [v for v in log.values(name) if v == v]
+        if valid:
+            print(f"  {name:<22} min {min(valid):10.3f}  avg {sum(valid) / len(valid):10.3f}  "
+                  f"max {max(valid):10.3f}  errors {log.count - len(valid)}")
+        else:
+            print(f"  {name:<22} no valid reads")
+
+
+def write_csv(log, out):
+    columns = [log.values(name) for name in log.names]
+    out.write(",".join(["t_ms", "bus", "addr", "status_word"] + log.names) + "\n")
+    rows = zip(log.column("t_ms"), log.column("bus"), log.column("addr"), log.column("status_word"), *columns)
+    for t, bus, addr, status, *values in rows:
+        out.write(f"{t},{bus},0x{addr:02X},0x{status:04X}," + ",".join(f"{v:.4f}" for v in values) + "\n")
+
+
+def main(args):
+    if not args:
+        print("Usage: logread.py <telemetry.bin> [--csv]")
+        return
+    with TelemetryLog(args[0]) as log:
+        if "--csv" in args:
+            write_csv(log, sys.stdout)
+        else:
+            summary(log)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,494 @@
+"""
+Эмулятор шины I2C и блока питания CRPS для запуска кода тестера на хосте (CPython).
+
+SimI2C повторяет методы machine.I2C, которые использует тестер, и ведёт
+расчётное время шины для заданной частоты (50/100/400 кГц) с учётом
+растяжения такта (clock stretching). Ошибки NACK выдаются как OSError,
+как это делает MicroPython на RP2040.
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Source"))
+
+from commands import command_by_code
+
+EIO = 5
+BIT_OVERHEAD = 2  # START/повторный START/STOP, в тактах
+
+ENERGY_RATE = 1000                     # отсчётов аккумулятора энергии в секунду
+ENERGY_SOURCES = {0x86: 0x97, 0x87: 0x96}  # READ_EIN <- READ_PIN, READ_EOUT <- READ_POUT
+
+
+def calc_pec(data):
+    crc = 0
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) if crc & 0x80 else (crc << 1)
+            crc &= 0xFF
+    return crc
+
+
+def linear11(value):
+    """Кодирует число в формат PMBus Linear11 с максимальной точностью."""
+    for n in range(-16, 16):
+        y = round(value / (2 ** n))
+        if -1024 <= y <= 1023:
+            return ((n & 0x1F) << 11) | (y & 0x7FF)
+    raise ValueError(value)
+
+
+def word(value):
+    return bytes([value & 0xFF, value >> 8])
+
+
+def decode_linear11(data):
+    raw = data[0] | (data[1] << 8)
+    n = (raw >> 11) - 32 if raw & 0x8000 else raw >> 11
+    y = (raw & 0x7FF) - 2048 if raw & 0x400 else raw & 0x7FF
+    return y * 2.0 ** n
+
+
+def block(text):
+    data = text.encode("ascii") if isinstance(text, str) else bytes(text)
+    return bytes([len(data)]) + data
+
+
+def crps_registers(vout=12.0, vin=230.0, iout=50.0, iin=2.9, temp1=32.0, temp2=41.0):
+    """Карта регистров типового CRPS блока 1600 Вт (VOUT_MODE = Linear16, N = -9)."""
+    vout_mode = 0x17
+    return {
+        0x01: b"\x80",                          # OPERATION
+        0x19: b"\xB0",                          # CAPABILITY: PEC, 400 кГц, SMBALERT#
+        0x20: bytes([vout_mode]),               # VOUT_MODE
+        0x40: word(int(13.5 * 512)),            # VOUT_OV_FAULT_LIMIT
+        0x44: word(int(10.8 * 512)),            # VOUT_UV_FAULT_LIMIT
+        0x46: word(linear11(150.0)),
+        0x4A: word(linear11(140.0)),
+        0x4F: word(linear11(110.0)),
+        0x51: word(linear11(100.0)),
+        0x55: word(linear11(300.0)),
+        0x57: word(linear11(290.0)),
+        0x58: word(linear11(85.0)),
+        0x59: word(linear11(80.0)),
+        0x78: b"\x00",
+        0x79: b"\x00\x00",
+        0x7A: b"\x00", 0x7B: b"\x00", 0x7C: b"\x00", 0x7D: b"\x00", 0x7F: b"\x00",
+        0x80: b"\x01",
+        0x81: b"\x00",
+        0x84: word(int(12.0 * 512)),            # READ_VSB_OUT
+        0x85: word(linear11(1.2)),
+        0x86: block(b"\x00\x00\x00\x00\x00\x00"),  # READ_EIN
+        0x87: block(b"\x00\x00\x00\x00\x00\x00"),  # READ_EOUT
+        0x88: word(linear11(vin)),
+        0x89: word(linear11(iin)),
+        0x8B: word(int(vout * 512)),
+        0x8C: word(linear11(iout)),
+        0x8D: word(linear11(temp1)),
+        0x8E: word(linear11(temp2)),
+        0x90: word(linear11(9800)),
+        0x96: word(linear11(vout * iout)),
+        0x97: word(linear11(vin * iin)),
+        0x98: b"\x22",                          # PMBUS_REVISION 1.2
+        0x99: block("ACME"),
+        0x9A: block("CRPS-1600W-12V"),
+        0x9B: block("A01"),
+        0xA0: word(linear11(90.0)),
+        0xA1: word(linear11(264.0)),
+        0xA4: word(int(11.4 * 512)),
+        0xA5: word(int(12.6 * 512)),
+        0xA6: word(linear11(133.0)),
+        0xB3: b"\x01", 0xB5: b"\x01", 0xB7: b"\x00", 0xB8: b"\x58",
+        0xBB: word(linear11(35.0)),
+    }
+
+
+def rail_pages(count=4):
+    """Карты регистров многоканального блока: страница на канал, свои VOUT/IOUT."""
+    return {page: crps_registers(vout=12.0 - 3.0 * page, iout=50.0 - 10.0 * page)
+            for page in range(count)}
+
+
+class SimPSU:
+    def __init__(self, addr=0x58, regs=None, stretch_us=0, nack_rate=0.0, seed=1, pages=None):
+        self.addr = addr
+        # pages - {страница: регистры} многоканального блока; regs - регистры текущей страницы
+        self.pages = pages
+        if pages is not None:
+            regs = pages[min(pages)]
+        self.regs = crps_registers() if regs is None else regs
+        self.page = min(pages) if pages is not None else 0
+        self.page_plus = None
+        self.stretch_us = stretch_us     # растяжение такта на каждую транзакцию
+        self.nack_rate = nack_rate       # доля случайных NACK (нестабильный блок)
+        self.max_freq = 400000           # выше этой частоты блок выдаёт NACK
+        self.marginal_freq = None        # выше этой частоты в ответах бывают битовые ошибки
+        self.bit_error_rate = 0.0        # доля ответов с искажённым битом выше marginal_freq
+        self.request = b""
+        self.query = None
+        self.rng = random.Random(seed)
+        self.pec_errors = 0
+        self.alert = False               # удерживает SMBALERT#
+        self.clock = time.perf_counter   # время аккумуляторов энергии, с
+        self.t0 = self.clock()
+        self.samples_offset = 0          # начальное число отсчётов (проверка переполнений)
+        # COEFFICIENTS (0x30) аккумуляторов энергии: {код: (m, b, R)}, пустой словарь - не поддерживается
+        self.coefficients = {0x86: (1, 0, 0), 0x87: (1, 0, 0)}
+        self.coeff_code = None
+
+    def supports(self, code):
+        if code in (0x00, 0x05, 0x06):
+            return self.pages is not None
+        if code == 0x30:
+            return self.coeff_code in self.coefficients
+        return code in self.regs
+
+    def query_byte(self, code):
+        if not self.supports(code):
+            return 0x00
+        return 0x80 | 0x20 | (0x40 if code in (0x00, 0x01, 0x03, 0x05) else 0)
+
+    def flaky(self):
+        return self.nack_rate and self.rng.random() < self.nack_rate
+
+    def corrupt(self, data, freq):
+        """Искажение бита в ответе на частоте выше marginal_freq (обнаруживается PEC)."""
+        if self.marginal_freq is None or freq <= self.marginal_freq or not data:
+            return data
+        if self.rng.random() >= self.bit_error_rate:
+            return data
+        data = bytearray(data)
+        bit = self.rng.randrange(8 * len(data))
+        data[bit // 8] ^= 1 << (bit % 8)
+        return bytes(data)
+
+    def energy(self, code):
+        """
+        READ_EIN/READ_EOUT: мощность из READ_PIN/READ_POUT в формате DIRECT
+        с коэффициентами блока (по умолчанию m=1 - Вт) суммируется ENERGY_RATE раз в секунду с переполнениями как в блоке.
+        """
+        samples = self.samples_offset + int((self.clock() - self.t0) * ENERGY_RATE)
+        m, b, r = self.coefficients.get(code, (1, 0, 0))
+        value = round((decode_linear11(self.regs[ENERGY_SOURCES[code]]) * m + b) * 10 ** r)
+        count = samples * value % (0x7FFF * 256)
+        rollover, acc = divmod(count, 0x7FFF)
+        samples &= 0xFFFFFF
+        return block(word(acc) + bytes([rollover]) + samples.to_bytes(3, "little"))
+
+    def on_page(self, page, func, *args):
+        """Выполняет чтение/запись на странице page, не меняя текущую страницу."""
+        if self.pages is None or page not in self.pages:
+            return None
+        regs = self.regs
+        self.regs = self.pages[page]
+        try:
+            return func(*args)
+        finally:
+            self.regs = regs
+
+    def read_page_plus(self):
+        """Ответ PAGE_PLUS_READ: счётчик и данные команды (блок уже начинается со счётчика)."""
+        if self.page_plus is None:
+            return None
+        page, code = self.page_plus
+        payload = self.on_page(page, self.read, code)
+        if payload is None:
+            return None
+        cmd = command_by_code(code)
+        if cmd is not None and cmd.type == "Block Read":
+            return payload
+        return bytes([len(payload)]) + payload
+
+    def read(self, code):
+        if code == 0x1A and self.query is not None:
+            return bytes([1, self.query])
+        if code == 0x06:
+            return self.read_page_plus()
+        if not self.supports(code):
+            return None
+        if code == 0x00:
+            return bytes([self.page])
+        if code == 0x30:
+            m, b, r = self.coefficients[self.coeff_code]
+            return block(word(m & 0xFFFF) + word(b & 0xFFFF) + bytes([r & 0xFF]))
+        if code in ENERGY_SOURCES:
+            return self.energy(code)
+        return self.regs[code]
+
+    def write(self, code, data):
+        if code == 0x03:
+            for status in (0x78, 0x7A, 0x7B, 0x7C, 0x7D, 0x7F, 0x81):
+                self.regs[status] = b"\x00"
+            self.regs[0x79] = b"\x00\x00"
+            return True
+        if code == 0x1A:
+            # [0x1A, count=1, code] по спецификации, [0x1A, code] - упрощённая форма
+            if len(data) >= 3 and data[1] == 1:
+                self.query = self.query_byte(data[2])
+            elif len(data) >= 2:
+                self.query = self.query_byte(data[1])
+            else:
+                self.query = None
+            return True
+        if code == 0x30:
+            # [0x30, 2, команда, 1 - чтение] - запрос Process Call, ответ выдаёт read()
+            self.coeff_code = data[2] if len(data) >= 4 and data[1] == 2 and data[3] == 1 else None
+            return True
+        if code == 0x00 and self.pages is not None:
+            if not data or data[0] not in self.pages:
+                return False
+            self.page = data[0]
+            self.regs = self.pages[self.page]
+            return True
+        if code == 0x06 and self.pages is not None:
+            # [0x06, 2, PAGE, команда] - запрос Process Call, ответ выдаёт read()
+            self.page_plus = (data[2], data[3]) if len(data) >= 4 and data[1] == 2 else None
+            return True
+        if code == 0x05 and self.pages is not None:
+            # [счётчик, PAGE, команда, данные...]
+            if len(data) < 3 or data[0] != len(data) - 1:
+                return False
+            return bool(self.on_page(data[1], self.write, data[2], data[3:]))
+        if not self.supports(code):
+            return False
+        self.regs[code] = bytes(data)
+        return True
+
+
+def fru_field(text):
+    data = text.encode("ascii")
+    return bytes([0xC0 | len(data)]) + data
+
+
+def fru_area(prefix, fields):
+    """Область FRU: версия, длина в 8-байтовых единицах, поля, 0xC1, выравнивание, контрольная сумма."""
+    body = bytes([0x01, 0]) + prefix + b"".join(fru_field(f) for f in fields) + b"\xC1"
+    body += b"\x00" * (-(len(body) + 1) % 8)
+    body = body[:1] + bytes([(len(body) + 1) // 8]) + body[2:]
+    return body + bytes([-sum(body) & 0xFF])
+
+
+def fru_record(kind, data, last=False):
+    header = bytes([kind, 0x02 | (0x80 if last else 0), len(data), -sum(data) & 0xFF])
+    return header + bytes([-sum(header) & 0xFF]) + data
+
+
+def fru_image(serial="P1600A0001", size=256):
+    """Образ FRU типового CRPS блока: board, product и записи Power Supply Information / DC Output."""
+    board = fru_area(bytes([0x00]) + (14_000_000).to_bytes(3, "little"),
+                     ("ACME", "CRPS-1600W-12V", serial, "PS-1600-12", "FRU-1"))
+    product = fru_area(bytes([0x00]), ("ACME", "CRPS 1600W", "PS-1600-12", "A01", serial, "", "FRU-1"))
+    psu_info = (word(1600) + word(1800) + bytes([40, 10]) + word(9000) + word(26400)
+                + word(9000) + word(26400) + bytes([47, 63, 10, 0x12]) + word(1600) + b"\x00\x00\x00\x00")
+    dc_output = bytes([0x81]) + word(1200) + word(60) + word(60) + word(120) + word(0) + word(60000)
+    multi = fru_record(0x00, psu_info) + fru_record(0x01, dc_output, last=True)
+    board_off = 1
+    product_off = board_off + len(board) // 8
+    multi_off = product_off + len(product) // 8
+    header = bytes([0x01, 0, 0, board_off, product_off, multi_off, 0])
+    header += bytes([-sum(header) & 0xFF])
+    image = header + board + product + multi
+    return image + b"\xFF" * (size - len(image))
+
+
+class SimEEPROM:
+    """
+    EEPROM 24Cxx: последовательное чтение, запись страницы с переносом внутри страницы,
+    на время внутреннего цикла записи (по расчётному времени шины) адрес не отвечает.
+    """
+
+    def __init__(self, addr=0x50, size=256, page=8, data=None, write_us=5000):
+        self.addr = addr
+        self.size = size
+        self.page = page
+        self.addrsize = 16 if size > 2048 else 8
+        # 24C04..24C16 занимают несколько адресов: старшие биты ячейки в адресе устройства
+        self.addrs = tuple(range(addr, addr + max(1, size // 256))) if self.addrsize == 8 else (addr,)
+        self.data = bytearray(data if data is not None else fru_image(size=size))
+        self.write_us = write_us
+        self.busy_until = 0.0
+        self.max_freq = 400000
+        self.stretch_us = 0
+        self.alert = False
+        self.request = b""
+        self.writes = 0
+
+    def flaky(self):
+        return False
+
+    def offset(self, addr, mem):
+        return mem if self.addrsize == 16 else ((addr - self.addr) << 8) | mem
+
+    def read_seq(self, addr, mem, n):
+        start = self.offset(addr, mem)
+        return bytes(self.data[(start + i) % self.size] for i in range(n))
+
+    def write_seq(self, addr, mem, buf, now_us):
+        start = self.offset(addr, mem)
+        base = start - start % self.page
+        for i, b in enumerate(buf):
+            self.data[base + (start - base + i) % self.page] = b
+        self.busy_until = now_us + self.write_us
+        self.writes += 1
+
+    def read(self, code):
+        return None
+
+    def write(self, code, data):
+        return False
+
+
+class SimPin:
+    """Вход SMBALERT# с подтяжкой: повторяет Pin.value() и Pin.irq()."""
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self):
+        self.level = 1
+        self.handler = None
+
+    def value(self):
+        return self.level
+
+    def irq(self, trigger=IRQ_FALLING, handler=None):
+        self.handler = handler
+
+    def drive(self, level):
+        falling = self.level and not level
+        self.level = level
+        if falling and self.handler:
+            self.handler(self)
+
+
+class SimI2C:
+    ARA_ADDR = 0x0C
+
+    def __init__(self, devices=(), freq=100000, alert_pin=None):
+        self.devices = {}
+        for dev in devices:
+            self.add(dev)
+        self.freq = freq
+        self.alert_pin = alert_pin
+        self.bus_time_us = 0.0
+        self.transactions = 0
+        self.nacks = 0
+        self.restart = False  # запись без STOP: следующее чтение - продолжение транзакции
+
+    def update_alert(self):
+        if self.alert_pin is not None:
+            asserted = any(dev.alert for dev in self.devices.values())
+            self.alert_pin.drive(0 if asserted else 1)
+
+    def raise_alert(self, addr, status_word, regs=None):
+        """Блок addr выставляет неисправность: STATUS_WORD и регистры {код: байты}."""
+        dev = self.devices[addr]
+        dev.regs[0x79] = word(status_word)
+        dev.regs[0x78] = bytes([status_word & 0xFF])
+        dev.regs.update(regs or {})
+        dev.alert = True
+        self.update_alert()
+
+    def _ara(self):
+        self.bus_time_us += (9 * 2 + BIT_OVERHEAD) * 1e6 / self.freq
+        self.transactions += 1
+        for addr in sorted(self.devices):
+            dev = self.devices[addr]
+            if dev.alert:
+                # Ответивший на ARA блок отпускает SMBALERT#
+                dev.alert = False
+                self.update_alert()
+                return bytes([addr << 1])
+        self.nacks += 1
+        raise OSError(EIO)
+
+    def add(self, dev):
+        for addr in getattr(dev, "addrs", (dev.addr,)):
+            self.devices[addr] = dev
+        return dev
+
+    def reset_counters(self):
+        self.bus_time_us = 0.0
+        self.transactions = 0
+        self.nacks = 0
+
+    def _transfer(self, addr, nbytes, restart=False):
+        dev = self.devices.get(addr)
+        if self.restart:
+            # Чтение после записи без STOP (Process Call): повторный START той же транзакции
+            self.restart = False
+            bits = 9 * nbytes + 1
+        else:
+            bits = 9 * nbytes + BIT_OVERHEAD + (1 if restart else 0)
+            self.transactions += 1
+        self.bus_time_us += bits * 1e6 / self.freq
+        if (dev is None or dev.flaky() or self.freq > dev.max_freq
+                or self.bus_time_us < getattr(dev, "busy_until", 0)):
+            self.nacks += 1
+            raise OSError(EIO)
+        self.bus_time_us += dev.stretch_us
+        return dev
+
+    def _response(self, dev, request, n, addr):
+        """
+        Ответ ведомого: данные, затем PEC (если мастер продолжает чтение),
+        далее 0xFF. request - байты записи до повторного START (для PEC).
+        """
+        payload = dev.read(request[0])
+        if payload is None:
+            self.nacks += 1
+            raise OSError(EIO)
+        pec = calc_pec(bytes([addr << 1]) + request + bytes([(addr << 1) | 1]) + payload)
+        return dev.corrupt((payload + bytes([pec]) + b"\xFF" * n)[:n], self.freq)
+
+    def scan(self):
+        self.bus_time_us += 128 * (9 + BIT_OVERHEAD) * 1e6 / self.freq
+        return sorted(self.devices)
+
+    def readfrom_mem(self, addr, memaddr, nbytes, addrsize=8):
+        dev = self._transfer(addr, 2 + addrsize // 8 + nbytes, restart=True)
+        if hasattr(dev, "read_seq"):
+            return dev.read_seq(addr, memaddr, nbytes)
+        return self._response(dev, bytes([memaddr]), nbytes, addr)
+
+    def readfrom_mem_into(self, addr, memaddr, buf, addrsize=8):
+        data = self.readfrom_mem(addr, memaddr, len(buf), addrsize)
+        buf[:] = data
+
+    def writeto_mem(self, addr, memaddr, buf, addrsize=8):
+        dev = self._transfer(addr, 1 + addrsize // 8 + len(buf))
+        if hasattr(dev, "write_seq"):
+            dev.write_seq(addr, memaddr, bytes(buf), self.bus_time_us)
+            return
+        if not dev.write(memaddr, bytes(buf)):
+            self.nacks += 1
+            raise OSError(EIO)
+
+    def writeto(self, addr, buf, stop=True):
+        dev = self._transfer(addr, 1 + len(buf))
+        if not buf:
+            return 0  # пустая запись: проверка ACK адреса (scan, ACK-опрос EEPROM)
+        buf = bytes(buf)
+        code, data = buf[0], buf[1:]
+        dev.request = buf
+        if data and calc_pec(bytes([addr << 1]) + buf[:-1]) == buf[-1]:
+            data = data[:-1]
+        if code in (0x1A, 0x06, 0x30):
+            dev.write(code, buf)
+        elif data or code == 0x03:  # 0x03 CLEAR_FAULTS - Send Byte без данных
+            if not dev.write(code, data):
+                self.nacks += 1
+                raise OSError(EIO)
+        self.restart = not stop
+        return len(buf)
+
+    def readfrom(self, addr, nbytes, stop=True):
+        if addr == self.ARA_ADDR:
+            return self._ara()[:nbytes]
+        dev = self._transfer(addr, 1 + nbytes)
+        return self._response(dev, dev.request, nbytes, addr)
+
+    def readfrom_into(self, addr, buf, stop=True):
+        buf[:] = self.readfrom(addr, len(buf), stop)
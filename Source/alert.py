@@ -0,0 +1,108 @@
+try:
+    from machine import Pin
+except ImportError:
+    Pin = None  # хост: используется эмулятор вывода из Host/sim.py
+from pmbus import PMBusDevice
+from status import read_fault_tree
+from compat import ticks_ms
+
+ARA_ADDR = 0x0C         # SMBus Alert Response Address
+MAX_ARA_READS = 8       # не больше ответов за одно обслуживание (защита от залипшей линии)
+QUEUE_SIZE = 32
+
+
+class AlertEvent:
+    __slots__ = ("t_ms", "addr", "faults")
+
+    def __init__(self, t_ms, addr, faults):
+        self.t_ms = t_ms
+        self.addr = addr
+        self.faults = faults
+
+
+class AlertHandler:
+    """
+    Обработка SMBALERT#: прерывание по спаду только отмечает событие,
+    чтение ARA и статусов выполняется в service() из основного цикла.
+    """
+
+    def __init__(self, i2c, pin, queue_size=QUEUE_SIZE):
+        self.i2c = i2c
+        self.pin = pin
+        self.queue_size = queue_size
+        self.events = []
+        self.lost = 0
+        self.pending = 0
+        self.t_irq = 0
+        self.devices = {}
+        self.pec = False   # режим PEC и число попыток чтения - как у устройства менеджера
+        self.retries = 3
+        pin.irq(trigger=pin.IRQ_FALLING, handler=self._irq)
+
+    @classmethod
+    def on_gpio(cls, i2c, gpio):
+        return cls(i2c, Pin(gpio, Pin.IN, Pin.PULL_UP))
+
+    def close(self):
+        self.pin.irq(handler=None)
+
+    def _irq(self, _pin):
+        if not self.pending:
+            self.t_irq = ticks_ms()
+        self.pending += 1
+
+    def asserted(self):
+        return self.pin.value() == 0
+
+    def active(self):
+        """Есть необслуженное событие: было прерывание или линия ещё удерживается."""
+        return self.pending or self.asserted()
+
+    def configure(self, pec, retries):
+        self.pec = pec
+        self.retries = retries
+        for dev in self.devices.values():
+            dev.pec = pec
+            dev.retries = retries
+
+    def device(self, addr):
+        dev = self.devices.get(addr)
+        if dev is None:
+            dev = PMBusDevice(self.i2c)
+            dev.addr = addr
+            dev.pec = self.pec
+            dev.retries = self.retries
+            self.devices[addr] = dev
+        return dev
+
+    def read_ara(self):
+        try:
+            return self.i2c.readfrom(ARA_ADDR, 1)[0] >> 1
+        except OSError:
+            return None
+
+    def push(self, event):
+        if len(self.events) >= self.queue_size:
+            self.events.pop(0)
+            self.lost += 1
+        self.events.append(event)
+
+    def service(self):
+        """Возвращает число обработанных устройств."""
+        if not self.active():
+            return 0
+        t_ms = self.t_irq if self.pending else ticks_ms()
+        self.pending = 0
+        handled = 0
+        for _ in range(MAX_ARA_READS):
+            addr = self.read_ara()
+            if addr is None:
+                break
+            self.push(AlertEvent(t_ms, addr, read_fault_tree(self.device(addr))))
+            handled += 1
+        return handled
+
+    def take(self):
+        events = self.events
+        self.events = []
+        return events
@@ -0,0 +1,85 @@
+from commands import (PAGE, VOUT_MODE, PMBUS_REVISION, CAPABILITY,
+                      MFR_ID, MFR_MODEL, MFR_REVISION,
+                      CLEAR_FAULTS, OPERATION)
+
+# Регистры, которые не меняются во время работы блока и могут кэшироваться
+CACHED_CODES = (VOUT_MODE.code, PMBUS_REVISION.code, CAPABILITY.code,
+                MFR_ID.code, MFR_MODEL.code, MFR_REVISION.code)
+
+# Регистры со своим значением на каждой странице (PAGE) многоканального блока
+PAGED_CODES = (VOUT_MODE.code,)
+
+# Команды, после записи которых кэш адреса сбрасывается целиком
+FLUSH_CODES = (CLEAR_FAULTS.code, OPERATION.code)
+
+
+class MetadataCache:
+    """
+    Значения по адресам; регистры PAGED_CODES хранятся по ключу (код, страница).
+    Страница адреса известна после успешной записи PAGE (set_page), до этого - None.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.pages = {}
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, addr, code, page=None):
+        if code not in PAGED_CODES:
+            return code
+        return (code, self.pages.get(addr) if page is None else page)
+
+    def get(self, addr, code, page=None):
+        regs = self.entries.get(addr)
+        key = self.key(addr, code, page)
+        if regs is not None and key in regs:
+            self.hits += 1
+            return regs[key]
+        self.misses += 1
+        return None
+
+    def put(self, addr, code, data, page=None):
+        if code in CACHED_CODES:
+            self.entries.setdefault(addr, {})[self.key(addr, code, page)] = bytes(data)
+
+    def set_page(self, addr, page):
+        self.pages[addr] = page
+
+    def drop_unknown_page(self, regs):
+        for key in [key for key in regs if isinstance(key, tuple) and key[1] is None]:
+            del regs[key]
+
+    def on_write(self, addr, code, page=None):
+        """
+        Запись code на адрес addr; page - страница PAGE_PLUS_WRITE
+        (по умолчанию - текущая страница адреса).
+        """
+        if code in FLUSH_CODES:
+            self.invalidate_addr(addr)
+            return
+        regs = self.entries.get(addr)
+        if code == PAGE.code:
+            # Страница неизвестна, пока запись не подтверждена set_page
+            self.pages.pop(addr, None)
+            if regs is not None:
+                self.drop_unknown_page(regs)
+            return
+        if regs is None:
+            return
+        regs.pop(self.key(addr, code, page), None)
+        if code in PAGED_CODES and page is not None:
+            # Значение, прочитанное при неизвестной странице, могло относиться к page
+            regs.pop((code, None), None)
+
+    def invalidate_addr(self, addr):
+        self.entries.pop(addr, None)
+        self.pages.pop(addr, None)
+
+    def clear(self):
+        self.entries = {}
+        self.pages = {}
+
+    def reset_counters(self):
+        self.hits = 0
+        self.misses = 0
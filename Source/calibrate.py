@@ -0,0 +1,153 @@
+"""
+Подбор частоты шины I2C для блока: частота повышается по шагам, на каждом шаге
+повторно читаются STATUS_WORD и MFR_ID (с PEC, если блок его поддерживает).
+Результат - профиль модели: максимальная стабильная частота и число попыток чтения.
+"""
+try:
+    from machine import I2C
+except ImportError:
+    I2C = None  # хост: частота эмулятора задаётся атрибутом freq
+from commands import CAPABILITY, STATUS_WORD, MFR_ID
+from discovery import CapabilityStore, model_key
+
+BASE_FREQ = 50000                              # безопасная частота по умолчанию
+FREQ_STEPS = (50000, 100000, 400000, 1000000)  # Standard, Fast, Fast-mode Plus
+VERIFY_ROUNDS = 20      # циклов STATUS_WORD + MFR_ID на шаг
+CHECK_ROUNDS = 5        # циклов проверки сохранённого профиля на конкретном блоке
+MAX_ERROR_RATE = 0.05   # доля неудачных чтений, при которой шаг ещё считается стабильным
+CAPABILITY_PEC = 0x80
+PROFILES_PATH = "bus_profiles.json"
+
+
+class BusClock:
+    """
+    Текущая частота шины. На RP2040 I2C(id, freq=...) перенастраивает тот же
+    объект шины (выводы сохраняются), ссылки на него в PMBusDevice остаются верными.
+    """
+
+    def __init__(self, i2c, bus_id, freq=None):
+        self.i2c = i2c
+        self.bus_id = bus_id
+        if freq is None:
+            # machine.I2C не сообщает частоту: шины создаются в main.py с BASE_FREQ
+            freq = getattr(i2c, "freq", BASE_FREQ)
+        self.freq = freq
+        self.base = freq
+        self.switches = 0
+
+    def set(self, freq):
+        if freq == self.freq:
+            return
+        if I2C is not None and isinstance(self.i2c, I2C):
+            I2C(self.bus_id, freq=freq)
+        else:
+            self.i2c.freq = freq
+        self.freq = freq
+        self.switches += 1
+
+
+class BusProfileStore(CapabilityStore):
+    """Профили шины по моделям: {"freq": Гц, "retries": n, "pec": bool, "steps": {Гц: [ошибок, чтений]}}."""
+
+    def __init__(self, path=PROFILES_PATH):
+        super().__init__(path)
+
+    def get(self, key):
+        return self.load().get(key)
+
+    def put(self, key, profile):
+        self.load()[key] = profile
+        self.save()
+
+
+def verify(device, reference, rounds, pec):
+    """
+    Повторные чтения STATUS_WORD и MFR_ID одной попыткой каждое.
+    Ошибка - NACK, несовпадение PEC или MFR_ID, отличный от эталона.
+    Возвращает (ошибок, чтений); останавливается, как только шаг заведомо нестабилен.
+    """
+    saved = device.pec
+    device.pec = pec
+    status = device.buffer(STATUS_WORD.size)
+    ident = bytearray(len(reference))
+    limit = int(2 * rounds * MAX_ERROR_RATE)
+    errors = 0
+    reads = 0
+    for _ in range(rounds):
+        if not device.read_into(STATUS_WORD.code, status, 1):
+            errors += 1
+        n = device.block_read_into(MFR_ID.code, ident)
+        if n != len(reference) or ident != reference:
+            errors += 1
+        reads += 2
+        if errors > limit:
+            break
+    device.pec = saved
+    return errors, reads
+
+
+def calibrate(device, clock, steps=FREQ_STEPS, rounds=VERIFY_ROUNDS):
+    """
+    Калибровка частоты для device на шине clock. Эталон MFR_ID и поддержка PEC
+    определяются на нижнем шаге. Частота повышается до первого нестабильного шага.
+    Возвращает профиль или None, если блок не отвечает на нижнем шаге.
+    После калибровки шина возвращается на исходную частоту.
+    """
+    start = clock.freq
+    clock.set(steps[0])
+    capability = device.read_bytes(CAPABILITY.code, 1)
+    pec = bool(capability and capability[0] & CAPABILITY_PEC)
+    reference = device.block_read(MFR_ID.code, MFR_ID.size)
+    if not reference:
+        clock.set(start)
+        return None
+    reference = bytearray(reference)
+    best = None
+    results = {}
+    for freq in steps:
+        clock.set(freq)
+        errors, reads = verify(device, reference, rounds, pec)
+        results[str(freq)] = [errors, reads]
+        if errors > int(2 * rounds * MAX_ERROR_RATE):
+            break
+        # Редкие ошибки на стабильной частоте покрываются повтором чтения
+        best = {"freq": freq, "retries": 1 if errors == 0 else 3}
+    clock.set(start)
+    if best is None:
+        return None
+    best["pec"] = pec
+    best["steps"] = results
+    return best
+
+
+def check_profile(device, clock, profile, rounds=CHECK_ROUNDS):
+    """Короткая проверка профиля модели на конкретном блоке (разводка шины у блоков разная)."""
+    reference = device.read_cached(MFR_ID.code, MFR_ID.size, True)
+    if not reference:
+        return False
+    start = clock.freq
+    clock.set(profile["freq"])
+    errors, reads = verify(device, bytearray(reference), rounds, profile["pec"])
+    clock.set(start)
+    return errors <= int(2 * rounds * MAX_ERROR_RATE)
+
+
+def resolve_profile(device, clock, store, force=False):
+    """
+    Профиль модели из хранилища либо после калибровки (результат сохраняется).
+    Если профиль модели не подтверждается на этом блоке, блок калибруется
+    отдельно, сохранённый профиль модели не меняется.
+    Возвращает (profile, key, calibrated).
+    """
+    clock.set(clock.base)
+    key = model_key(device)
+    if key is not None and not force:
+        profile = store.get(key)
+        if profile is not None:
+            if check_profile(device, clock, profile):
+                return profile, key, False
+            return calibrate(device, clock), key, True
+    profile = calibrate(device, clock)
+    if profile is not None and key is not None:
+        store.put(key, profile)
+    return profile, key, True
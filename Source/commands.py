@@ -1,15 +1,43 @@
+# Идентификаторы декодеров (индексы в decode.DECODERS)
+DEC_RAW = 0         # байт как целое, блок/прочее как байты
+DEC_LINEAR11 = 1
+DEC_LINEAR16 = 2    # экспонент из VOUT_MODE
+DEC_DIRECT = 3      # коэффициенты m, b, R
+DEC_ASCII = 4       # строковый блок MFR_*
+DEC_STATUS = 5      # битовое поле STATUS_*
+DEC_ENERGY = 6      # аккумулятор энергии READ_EIN/READ_EOUT
+
+
+def default_decoder(code, name, size, type):
+    if name.startswith("STATUS_"):
+        return DEC_STATUS
+    if type == "Block Read":
+        if name.startswith("MFR_") or "ID" in name or "REVISION" in name:
+            return DEC_ASCII
+        return DEC_RAW
+    if type == "Read Byte" or size == 1:
+        return DEC_RAW
+    if type == "Read Word" or size == 2:
+        return DEC_LINEAR11  # команды формата VOUT_MODE - см. VOUT_FORMAT_CMDS
+    return DEC_RAW
+
+
 class PMBusCommand:
-    def __init__(self, code, name="", size=1, type="Read Byte"):
+    def __init__(self, code, name="", size=1, type="Read Byte", decoder=None, coeffs=None):
         self.code = code
         self.name = name
         self.size = size
         self.type = type
+        self.decoder = default_decoder(code, name, size, type) if decoder is None else decoder
+        self.coeffs = coeffs  # (m, b, R) для DEC_DIRECT
 
     def __repr__(self):
         return f"<PMBusCommand {self.name} (0x{self.code:02X}, {self.type}, {self.size}B)>"
 
 
 # --- Basic Commands ---
+PAGE                = PMBusCommand(0x00, "PAGE", 1, "Read Byte")
+OPERATION           = PMBusCommand(0x01, "OPERATION", 1, "Read Byte")
 CLEAR_FAULTS        = PMBusCommand(0x03, "CLEAR_FAULTS", 0, "Send Byte")
 CAPABILITY          = PMBusCommand(0x19, "CAPABILITY", 1, "Read Byte")
 QUERY               = PMBusCommand(0x1A, "QUERY", 1, "Block Read")
@@ -41,8 +69,10 @@ READ_VIN_TYPE       = PMBusCommand(0x80, "READ_VIN_TYPE", 1, "Read Byte")
 STATUS_FANS_1_2     = PMBusCommand(0x81, "STATUS_FANS_1_2", 1, "Read Byte")
 READ_VSB_OUT        = PMBusCommand(0x84, "READ_VSB_OUT", 2, "Read Word")
 READ_ISB_OUT        = PMBusCommand(0x85, "READ_ISB_OUT", 2, "Read Word")
-READ_EIN            = PMBusCommand(0x86, "READ_EIN", 6, "Block Read")
-READ_EOUT           = PMBusCommand(0x87, "READ_EOUT", 6, "Block Read")
+# Аккумулятор в формате DIRECT; (1, 0, 0) - Вт·отсчёт, если блок не поддерживает COEFFICIENTS
+# (коэффициенты блока читает energy.EnergyMeter)
+READ_EIN            = PMBusCommand(0x86, "READ_EIN", 6, "Block Read", DEC_ENERGY, (1, 0, 0))
+READ_EOUT           = PMBusCommand(0x87, "READ_EOUT", 6, "Block Read", DEC_ENERGY, (1, 0, 0))
 READ_VIN            = PMBusCommand(0x88, "READ_VIN", 2, "Read Word")
 READ_IIN            = PMBusCommand(0x89, "READ_IIN", 2, "Read Word")
 READ_VOUT           = PMBusCommand(0x8B, "READ_VOUT", 2, "Read Word")
@@ -74,3 +104,49 @@ MFR_VIN_MAX         = PMBusCommand(0xA1, "MFR_VIN_MAX", 2, "Read Word")
 MFR_VOUT_MIN        = PMBusCommand(0xA4, "MFR_VOUT_MIN", 2, "Read Word")
 MFR_VOUT_MAX        = PMBusCommand(0xA5, "MFR_VOUT_MAX", 2, "Read Word")
 MFR_IOUT_MAX        = PMBusCommand(0xA6, "MFR_IOUT_MAX", 2, "Read Word")
+
+# Набор параметров, опрашиваемых командой params
+PARAM_CMDS = (
+    VOUT_OV_FAULT_LIMIT, VOUT_UV_FAULT_LIMIT,
+    IOUT_OC_FAULT_LIMIT, IOUT_OC_WARN_LIMIT,
+    OT_FAULT_LIMIT, OT_WARN_LIMIT,
+    VIN_OV_FAULT_LIMIT, VIN_OV_WARN_LIMIT,
+    VIN_UV_WARN_LIMIT, VIN_UV_FAULT_LIMIT,
+    READ_VIN, READ_IIN, READ_VOUT, READ_IOUT,
+    READ_TEMPERATURE_1, READ_TEMPERATURE_2, READ_TEMPERATURE_3,
+    READ_FAN_SPEED_1, READ_POUT, READ_PIN,
+    VOUT_MODE, MFR_ID, MFR_MODEL, MFR_REVISION,
+    MFR_VIN_MIN, MFR_VIN_MAX, MFR_VOUT_MIN, MFR_VOUT_MAX, MFR_IOUT_MAX, READ_LSB, READ_VSB_OUT, READ_ISB_OUT, READ_FAN_DUTY,
+    READ_PSON, READ_CRB, READ_VINOK, READ_ALERT, READ_ADDR
+)
+
+# Команды, значения которых кодируются в формате VOUT_MODE (Linear16)
+VOUT_FORMAT_CMDS = (READ_VOUT, VOUT_OV_FAULT_LIMIT, VOUT_UV_FAULT_LIMIT, MFR_VOUT_MIN, MFR_VOUT_MAX, READ_VSB_OUT)
+for _cmd in VOUT_FORMAT_CMDS:
+    _cmd.decoder = DEC_LINEAR16
+del _cmd
+
+# Постраничные параметры многоканального блока (команда pages)
+PAGE_CMDS = (READ_VOUT, READ_IOUT, READ_POUT, READ_TEMPERATURE_1, STATUS_WORD)
+
+
+# --- Реестр: строится один раз при импорте ---
+COMMANDS = tuple(sorted((cmd for cmd in globals().values() if isinstance(cmd, PMBusCommand)),
+                        key=lambda cmd: cmd.code))
+BY_CODE = [None] * 256
+for _cmd in COMMANDS:
+    BY_CODE[_cmd.code] = _cmd
+BY_NAME = {cmd.name.lower(): cmd for cmd in COMMANDS}
+del _cmd
+
+
+def find_command(name):
+    return BY_NAME.get(name.lower())
+
+
+def command_by_code(code):
+    return BY_CODE[code] if 0 <= code < len(BY_CODE) else None
+
+
+def all_commands():
+    return COMMANDS
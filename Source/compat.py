@@ -0,0 +1,44 @@
+import gc
+import time
+
+# На хосте (CPython) нет ticks_* и sleep_ms из MicroPython, эмулируем их,
+# чтобы логику опроса можно было проверять на Linux с эмулятором шины.
+try:
+    ticks_us = time.ticks_us
+    ticks_ms = time.ticks_ms
+    ticks_diff = time.ticks_diff
+    ticks_add = time.ticks_add
+    sleep_ms = time.sleep_ms
+    sleep_us = time.sleep_us
+except AttributeError:
+    TICKS_PERIOD = 1 << 30
+
+    def ticks_us():
+        return time.perf_counter_ns() // 1000 % TICKS_PERIOD
+
+    def ticks_ms():
+        return time.perf_counter_ns() // 1000000 % TICKS_PERIOD
+
+    def ticks_add(ticks, delta):
+        return (ticks + delta) % TICKS_PERIOD
+
+    def ticks_diff(end, start):
+        diff = (end - start) % TICKS_PERIOD
+        return diff - TICKS_PERIOD if diff >= TICKS_PERIOD // 2 else diff
+
+    def sleep_ms(ms):
+        time.sleep(ms / 1000)
+
+    def sleep_us(us):
+        time.sleep(us / 1000000)
+
+
+# Объём занятой кучи: на MicroPython - gc.mem_alloc(), на хосте - tracemalloc
+# (если трассировка включена, иначе 0)
+try:
+    mem_alloc = gc.mem_alloc
+except AttributeError:
+    import tracemalloc
+
+    def mem_alloc():
+        return tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
@@ -1,4 +1,5 @@
 import struct
+from commands import DEC_RAW, DEC_LINEAR11, DEC_LINEAR16, DEC_DIRECT, DEC_ASCII, DEC_STATUS, DEC_ENERGY
 
 
 def decode_linear_format(lsb, msb):
@@ -22,3 +23,105 @@ def linear16_to_float(raw: int, exponent: int) -> float:
 
     return raw * (2 ** exponent)
 
+
+def vout_exponent(mode):
+    """
+    Извлекает знаковый 5-битный экспонент из байта VOUT_MODE.
+    """
+    exponent = mode & 0x1F
+    if exponent > 15:
+        exponent -= 32
+    return exponent
+
+
+def direct_to_float(raw, coeffs):
+    """
+    Формат DIRECT: X = (Y * 10^-R - b) / m, Y - знаковое 16-битное.
+    """
+    m, b, r = coeffs
+    if raw & 0x8000:
+        raw -= 0x10000
+    return (raw * 10 ** -r - b) / m
+
+
+def _raw(cmd, data, exponent):
+    return data[0] if len(data) == 1 else bytes(data)
+
+
+def _linear11(cmd, data, exponent):
+    return decode_linear_format(data[0], data[1])
+
+
+def _linear16(cmd, data, exponent):
+    if exponent is None:
+        return None
+    return linear16_to_float(data[0] | (data[1] << 8), exponent)
+
+
+def _direct(cmd, data, exponent):
+    return direct_to_float(data[0] | (data[1] << 8), cmd.coeffs)
+
+
+def _block(cmd, data, exponent):
+    return bytes(data)
+
+
+def _status(cmd, data, exponent):
+    return data[0] if len(data) == 1 else (data[1] << 8) | data[0]
+
+
+def decode_energy(data):
+    """
+    Аккумулятор энергии READ_EIN/READ_EOUT (6 байт, little-endian):
+    аккумулятор u16, счётчик переполнений u8, число отсчётов u24.
+    :return: (accumulator, rollover, samples)
+    """
+    return (data[0] | (data[1] << 8), data[2],
+            data[3] | (data[4] << 8) | (data[5] << 16))
+
+
+def _energy(cmd, data, exponent):
+    if len(data) < 6:
+        return None
+    return decode_energy(data)
+
+
+# Таблица декодеров, индекс - PMBusCommand.decoder
+DECODERS = [None] * 7
+DECODERS[DEC_RAW] = _raw
+DECODERS[DEC_LINEAR11] = _linear11
+DECODERS[DEC_LINEAR16] = _linear16
+DECODERS[DEC_DIRECT] = _direct
+DECODERS[DEC_ASCII] = _block
+DECODERS[DEC_STATUS] = _status
+DECODERS[DEC_ENERGY] = _energy
+
+
+def decode_value(cmd, data, exponent=None):
+    """
+    Преобразует сырые байты ответа в значение декодером команды.
+    :param cmd: PMBusCommand
+    :param data: прочитанные байты (или None при ошибке)
+    :param exponent: экспонент VOUT_MODE для команд в формате Linear16
+    :return: int / float / bytes или None
+    """
+    if not data:
+        return None
+    return DECODERS[cmd.decoder](cmd, data, exponent)
+
+
+def format_value(cmd, value):
+    if value is None:
+        return f"{cmd.name:<25}: [ERROR]"
+    if cmd.decoder == DEC_STATUS:
+        return f"{cmd.name:<25}: 0x{value:04X}"
+    if cmd.decoder == DEC_ENERGY:
+        acc, rollover, samples = value
+        return f"{cmd.name:<25}: acc={acc} rollover={rollover} samples={samples}"
+    if isinstance(value, (int, float)):
+        return f"{cmd.name:<25}: {value:.2f}"
+    if cmd.decoder == DEC_ASCII:
+        text = "".join(chr(b) for b in value if 0x20 <= b < 0x7F).strip()
+        return f"{cmd.name:<25}: {text[:60]}" + ("..." if len(text) > 60 else "")
+    hex_str = " ".join(hex(b) for b in value)
+    return f"{cmd.name:<25}: {hex_str[:60]}" + ("..." if len(hex_str) > 60 else "")
@@ -0,0 +1,109 @@
+import json
+from commands import MFR_ID, MFR_MODEL, MFR_REVISION, all_commands
+from compat import sleep_ms
+
+SUPPORTED_BIT = 0x80
+QUERY_RETRIES = 3  # попыток QUERY на команду: NACK или ошибка шины не означают "не поддерживается"
+DEFAULT_PATH = "capabilities.json"
+
+
+def block_text(data):
+    """Печатные ASCII-символы блока (байт счётчика и заполнение отбрасываются)."""
+    return "".join(chr(b) for b in data if 0x20 <= b < 0x7F).strip() if data else ""
+
+
+def model_key(device):
+    """Ключ модели MFR_ID|MFR_MODEL|MFR_REVISION или None, если строки не читаются."""
+    parts = []
+    for cmd in (MFR_ID, MFR_MODEL, MFR_REVISION):
+        text = block_text(device.read_cached(cmd.code, cmd.size, True))
+        if not text:
+            return None
+        parts.append(text)
+    return "|".join(parts)
+
+
+def query(device, code, retries=QUERY_RETRIES):
+    """QUERY с повторами. Возвращает байт ответа или None, если блок так и не ответил."""
+    for attempt in range(retries):
+        result = device.query(code)
+        if result is not None:
+            return result
+        if attempt + 1 < retries:
+            sleep_ms(10)
+    return None
+
+
+def discover(device, cmds=None, retries=QUERY_RETRIES):
+    """
+    Опрашивает QUERY для каждой команды.
+    Возвращает (поддерживаемые коды, коды без ответа на QUERY);
+    поддерживаемые - None, если QUERY не работает вовсе.
+    """
+    cmds = cmds or all_commands()
+    supported = set()
+    failed = set()
+    for cmd in cmds:
+        result = query(device, cmd.code, retries)
+        if result is None:
+            failed.add(cmd.code)
+        elif result & SUPPORTED_BIT:
+            supported.add(cmd.code)
+    if not supported and len(failed) == len(cmds):
+        return None, failed
+    return supported, failed
+
+
+class CapabilityStore:
+    """Результаты discovery по моделям блоков, хранятся в JSON на flash."""
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.models = None
+
+    def load(self):
+        if self.models is None:
+            try:
+                with open(self.path) as f:
+                    self.models = json.load(f)
+            except (OSError, ValueError):
+                self.models = {}
+        return self.models
+
+    def get(self, key):
+        codes = self.load().get(key)
+        return set(codes) if codes is not None else None
+
+    def put(self, key, supported):
+        self.load()[key] = sorted(supported)
+        self.save()
+
+    def forget(self, key):
+        if self.load().pop(key, None) is not None:
+            self.save()
+
+    def save(self):
+        try:
+            with open(self.path, "w") as f:
+                json.dump(self.models, f)
+        except OSError as e:
+            print("Capability store write error:", e)
+
+    def resolve(self, device, force=False):
+        """
+        Возвращает (supported, key, probed, failed): набор поддерживаемых кодов
+        из хранилища либо после discovery. Результат сохраняется, только если
+        на QUERY ответили все команды; коды без ответа входят в набор сеанса
+        (опрашиваются как поддерживаемые), но не попадают в хранилище.
+        """
+        key = model_key(device)
+        if key is not None and not force:
+            supported = self.get(key)
+            if supported is not None:
+                return supported, key, False, set()
+        supported, failed = discover(device)
+        if supported is None:
+            return None, key, True, failed
+        if key is not None and not failed:
+            self.put(key, supported)
+        return supported | failed, key, True, failed
@@ -0,0 +1,150 @@
+"""
+EEPROM FRU блока CRPS (24Cxx): последовательное чтение большими транзакциями,
+запись страницами с ACK-опросом и кэш образов по блокам с проверкой подписи FRU.
+"""
+from compat import ticks_ms, ticks_diff
+from fru import fru_signature
+
+READ_CHUNK = 256        # байт за одну транзакцию чтения
+WRITE_TIMEOUT_MS = 20   # внутренний цикл записи 24Cxx - до 5-10 мс
+IMAGE_CACHE_SIZE = 4    # образов в кэше (до 2 КБ каждый)
+
+
+class Eeprom:
+    """
+    До 2 КБ (24C02..24C16) адрес ячейки 8-битный, старшие биты адреса - в адресе
+    устройства; больше 2 КБ (24C32 и выше) - 16-битный адрес ячейки.
+    """
+
+    def __init__(self, i2c, addr, size=256, page=8):
+        self.i2c = i2c
+        self.addr = addr
+        self.size = size
+        self.page = page
+        self.addrsize = 16 if size > 2048 else 8
+        self.polls = 0  # ACK-опросов за последнюю запись
+
+    def locate(self, offset):
+        if self.addrsize == 16:
+            return self.addr, offset
+        return self.addr | (offset >> 8), offset & 0xFF
+
+    def check_range(self, offset, length):
+        if offset < 0 or length < 0 or offset + length > self.size:
+            raise ValueError(f"0x{offset:X}+{length} is outside {self.size} B EEPROM")
+
+    def read_into(self, offset, buf):
+        """Последовательное чтение в буфер, транзакции по READ_CHUNK байт без пересечения блоков."""
+        self.check_range(offset, len(buf))
+        mv = memoryview(buf)
+        done = 0
+        while done < len(buf):
+            pos = offset + done
+            chunk = min(len(buf) - done, READ_CHUNK - pos % READ_CHUNK)
+            dev, mem = self.locate(pos)
+            try:
+                self.i2c.readfrom_mem_into(dev, mem, mv[done:done + chunk], addrsize=self.addrsize)
+            except OSError as e:
+                print(f"EEPROM read error at 0x{pos:04X}: {e}")
+                return False
+            done += chunk
+        return True
+
+    def read(self, offset, length):
+        buf = bytearray(length)
+        return buf if self.read_into(offset, buf) else None
+
+    def wait_ready(self, dev, timeout_ms=WRITE_TIMEOUT_MS):
+        """
+        ACK-опрос: во время внутреннего цикла записи микросхема не отвечает на свой адрес.
+        Возвращает число опросов или -1 по таймауту.
+        """
+        start = ticks_ms()
+        polls = 0
+        while True:
+            polls += 1
+            try:
+                self.i2c.writeto(dev, b"")
+                return polls
+            except OSError:
+                if ticks_diff(ticks_ms(), start) > timeout_ms:
+                    return -1
+
+    def write(self, offset, data):
+        """Запись сегментами, не пересекающими границу страницы; после каждого - ACK-опрос."""
+        self.check_range(offset, len(data))
+        mv = memoryview(bytes(data))
+        self.polls = 0
+        done = 0
+        while done < len(mv):
+            pos = offset + done
+            chunk = min(len(mv) - done, self.page - pos % self.page)
+            dev, mem = self.locate(pos)
+            try:
+                self.i2c.writeto_mem(dev, mem, mv[done:done + chunk], addrsize=self.addrsize)
+            except OSError as e:
+                print(f"EEPROM write error at 0x{pos:04X}: {e}")
+                return False
+            polls = self.wait_ready(dev)
+            if polls < 0:
+                print(f"EEPROM write timeout at 0x{pos:04X}")
+                return False
+            self.polls += polls
+            done += chunk
+        return True
+
+
+class FruStore:
+    """
+    Образы EEPROM по блоку (шина, адрес EEPROM); подпись FRU (заголовок, контрольные
+    суммы областей, заголовки MultiRecord) только подтверждает, что образ не изменился.
+    Подпись читается несколькими короткими транзакциями, полный образ -
+    только для нового блока или после изменения содержимого.
+    """
+
+    def __init__(self, capacity=IMAGE_CACHE_SIZE):
+        self.capacity = capacity
+        self.images = {}  # {(bus_id, addr): (подпись, образ)}
+        self.order = []
+        self.hits = 0
+        self.misses = 0
+
+    def put(self, unit, sig, image):
+        if unit in self.order:
+            self.order.remove(unit)
+        self.order.append(unit)
+        if len(self.order) > self.capacity:
+            del self.images[self.order.pop(0)]
+        self.images[unit] = (sig, image)
+
+    def forget(self, unit):
+        if unit in self.images:
+            del self.images[unit]
+            self.order.remove(unit)
+
+    def clear(self):
+        self.images = {}
+        self.order = []
+
+    def load(self, eeprom, force=False, bus_id=0):
+        """
+        Образ EEPROM. Возвращает (образ, взят_из_кэша) или (None, False) при ошибке чтения.
+        """
+        unit = (bus_id, eeprom.addr)
+        entry = self.images.get(unit)
+        if entry is not None and not force:
+            sig = fru_signature(eeprom.read, eeprom.size)
+            if sig is not None and sig == entry[0] and len(entry[1]) == eeprom.size:
+                self.hits += 1
+                return entry[1], True
+        image = eeprom.read(0, eeprom.size)
+        if image is None:
+            return None, False
+        self.misses += 1
+        image = bytes(image)
+        sig = fru_signature(lambda offset, length: image[offset:offset + length], len(image))
+        if sig is not None:
+            self.put(unit, sig, image)
+        else:
+            self.forget(unit)
+        return image, False
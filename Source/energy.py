@@ -0,0 +1,109 @@
+"""
+Средняя мощность и КПД по аккумуляторам энергии READ_EIN / READ_EOUT.
+
+Блок суммирует мощность в аккумулятор на каждом внутреннем отсчёте,
+поэтому два чтения на границах окна дают точное среднее за окно
+вместо частого опроса READ_PIN / READ_POUT.
+"""
+from commands import READ_EIN, READ_EOUT
+from decode import decode_energy
+from compat import ticks_ms, ticks_diff
+
+ACCUMULATOR_MAX = 0x7FFF            # аккумулятор переполняется после максимума DIRECT
+ENERGY_MOD = ACCUMULATOR_MAX * 256  # полный период: аккумулятор + 8-битный счётчик переполнений
+SAMPLES_MOD = 1 << 24               # 24-битный счётчик отсчётов
+
+
+def energy_count(reading):
+    acc, rollover, samples = reading
+    return rollover * ACCUMULATOR_MAX + acc
+
+
+def average_power(first, second, coeffs=(1, 0, 0)):
+    """
+    Средняя мощность между двумя чтениями аккумулятора (Вт).
+    Переполнения учитываются по модулю, окно должно быть короче полного периода счётчиков.
+    :return: (мощность, число отсчётов) или (None, 0), если новых отсчётов нет
+    """
+    samples = (second[2] - first[2]) % SAMPLES_MOD
+    if not samples:
+        return None, 0
+    energy = (energy_count(second) - energy_count(first)) % ENERGY_MOD
+    m, b, r = coeffs
+    return (energy / samples * 10 ** -r - b) / m, samples
+
+
+class EnergyReading:
+    __slots__ = ("addr", "t_ms", "ein", "eout", "coeffs")
+
+    def __init__(self, addr, t_ms, ein, eout, coeffs):
+        self.addr = addr
+        self.t_ms = t_ms
+        self.ein = ein
+        self.eout = eout
+        self.coeffs = coeffs  # (коэффициенты READ_EIN, READ_EOUT, прочитаны из блока)
+
+
+class EnergyWindow:
+    __slots__ = ("ms", "pin", "pout", "samples_in", "samples_out", "efficiency")
+
+    def __init__(self, first, second):
+        self.ms = ticks_diff(second.t_ms, first.t_ms)
+        self.pin, self.samples_in = None, 0
+        self.pout, self.samples_out = None, 0
+        coeffs_in, coeffs_out, _ = second.coeffs
+        if first.ein and second.ein:
+            self.pin, self.samples_in = average_power(first.ein, second.ein, coeffs_in)
+        if first.eout and second.eout:
+            self.pout, self.samples_out = average_power(first.eout, second.eout, coeffs_out)
+        self.efficiency = None
+        if self.pin and self.pout is not None:
+            self.efficiency = self.pout / self.pin
+
+
+class EnergyMeter:
+    """
+    Чтения аккумуляторов текущего блока; последнее чтение по каждому адресу
+    хранится, чтобы следующее окно начиналось с него без повторного чтения.
+    Коэффициенты DIRECT читаются из блока (COEFFICIENTS) один раз на адрес;
+    если блок их не сообщает, используются коэффициенты из реестра команд.
+    """
+
+    def __init__(self, device):
+        self.device = device
+        self.buf = bytearray(READ_EIN.size)
+        self.last = {}
+        self.coeffs = {}
+
+    def forget(self, addr):
+        """Другой блок на адресе: прежние чтение и коэффициенты недействительны."""
+        self.last.pop(addr, None)
+        self.coeffs.pop(addr, None)
+
+    def unit_coeffs(self):
+        addr = self.device.addr
+        coeffs = self.coeffs.get(addr)
+        if coeffs is None:
+            unit_in = self.device.coefficients(READ_EIN.code)
+            unit_out = self.device.coefficients(READ_EOUT.code)
+            from_unit = bool(unit_in and unit_in[0] and unit_out and unit_out[0])  # m = 0 недопустим
+            if from_unit:
+                coeffs = (unit_in, unit_out, True)
+            else:
+                coeffs = (READ_EIN.coeffs, READ_EOUT.coeffs, False)
+            self.coeffs[addr] = coeffs
+        return coeffs
+
+    def read(self, cmd):
+        if self.device.read_command_into(cmd, self.buf) != len(self.buf):
+            return None
+        return decode_energy(self.buf)
+
+    def sample(self):
+        coeffs = self.unit_coeffs()
+        reading = EnergyReading(self.device.addr, ticks_ms(), self.read(READ_EIN), self.read(READ_EOUT), coeffs)
+        self.last[reading.addr] = reading
+        return reading
+
+    def previous(self):
+        return self.last.get(self.device.addr)
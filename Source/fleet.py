@@ -0,0 +1,160 @@
+from commands import (READ_VIN, READ_IIN, READ_VOUT, READ_IOUT,
+                      READ_PIN, READ_POUT, READ_TEMPERATURE_1, STATUS_WORD)
+from pmbus import PMBusDevice
+from snapshot import SnapshotReader
+from compat import ticks_ms, ticks_add, ticks_diff
+
+FLEET_CMDS = (READ_VIN, READ_IIN, READ_VOUT, READ_IOUT,
+              READ_PIN, READ_POUT, READ_TEMPERATURE_1, STATUS_WORD)
+
+
+class Target:
+    __slots__ = ("bus_id", "addr", "period_ms", "next_due", "device", "reader", "freq")
+
+    def __init__(self, bus_id, i2c, addr, cmds, period_ms):
+        self.bus_id = bus_id
+        self.addr = addr
+        self.period_ms = period_ms
+        self.next_due = ticks_ms()
+        self.device = PMBusDevice(i2c)
+        self.device.addr = addr
+        self.reader = SnapshotReader(self.device, cmds)
+        self.freq = None  # частота шины из профиля модели, None - базовая частота шины
+
+
+class FleetSnapshot:
+    __slots__ = ("t_ms", "results")
+
+    def __init__(self, t_ms, results):
+        self.t_ms = t_ms
+        self.results = results  # {(bus_id, addr): Snapshot}
+
+
+class FleetPoller:
+    """
+    Опрос нескольких блоков питания на одной или двух шинах I2C.
+    Каждая цель опрашивается со своим периодом, внутри шины - по кругу.
+    При parallel=True шина I2C1 опрашивается потоком на втором ядре.
+    Если заданы bus_clocks, перед опросом цели шина переключается на её частоту.
+    """
+
+    def __init__(self, buses, cmds=FLEET_CMDS, clock=ticks_ms, bus_clocks=None):
+        self.buses = buses  # {bus_id: I2C}
+        self.bus_clocks = bus_clocks or {}  # {bus_id: BusClock}
+        self.cmds = cmds
+        self.clock = clock
+        self.targets = {bus_id: [] for bus_id in buses}
+        self.rr = {bus_id: 0 for bus_id in buses}
+        self.results = {bus_id: [] for bus_id in buses}
+        self.worker_buses = ()
+        self.running = False
+        self._go = None
+        self._done = None
+        self.worker_error = None  # исключение опроса на втором ядре, передаётся в cycle()
+
+    def add(self, bus_id, addr, period_ms=0):
+        if bus_id not in self.buses:
+            raise ValueError(f"I2C{bus_id} is not configured")
+        for target in self.targets[bus_id]:
+            if target.addr == addr:
+                target.period_ms = period_ms
+                return target
+        target = Target(bus_id, self.buses[bus_id], addr, self.cmds, period_ms)
+        target.next_due = self.clock()
+        self.targets[bus_id].append(target)
+        return target
+
+    def set_freq(self, target, freq):
+        """Частота цели; цели шины упорядочиваются по частоте, чтобы переключений за цикл было меньше."""
+        target.freq = freq
+        self.targets[target.bus_id].sort(key=lambda t: t.freq or 0)
+
+    def remove(self, bus_id, addr):
+        self.targets[bus_id] = [t for t in self.targets[bus_id] if t.addr != addr]
+        self.rr[bus_id] = 0
+
+    def clear(self):
+        for bus_id in self.targets:
+            self.targets[bus_id] = []
+            self.rr[bus_id] = 0
+
+    def all_targets(self):
+        for bus_id in sorted(self.targets):
+            for target in self.targets[bus_id]:
+                yield target
+
+    def poll_bus(self, bus_id):
+        targets = self.targets[bus_id]
+        results = self.results[bus_id]
+        results.clear()
+        count = len(targets)
+        if not count:
+            return results
+        start = self.rr[bus_id] % count
+        bus_clock = self.bus_clocks.get(bus_id)
+        for i in range(count):
+            target = targets[(start + i) % count]
+            now = self.clock()
+            if ticks_diff(now, target.next_due) < 0:
+                continue
+            if bus_clock is not None:
+                bus_clock.set(target.freq or bus_clock.base)
+            results.append(target.reader.capture())
+            target.next_due = ticks_add(now, target.period_ms)
+        # Следующий цикл начинается со следующей цели, чтобы порядок был честным
+        self.rr[bus_id] = (start + 1) % count
+        return results
+
+    def start_worker(self, bus_ids=(1,)):
+        import _thread
+        self.worker_buses = tuple(b for b in bus_ids if b in self.buses)
+        if not self.worker_buses:
+            return
+        self._go = _thread.allocate_lock()
+        self._done = _thread.allocate_lock()
+        self._go.acquire()
+        self._done.acquire()
+        self.running = True
+        _thread.start_new_thread(self._worker, ())
+
+    def stop_worker(self):
+        if self.running:
+            self.running = False
+            self._go.release()
+            self._done.acquire()
+        self.worker_buses = ()
+
+    def _worker(self):
+        while True:
+            self._go.acquire()
+            if not self.running:
+                break
+            try:
+                for bus_id in self.worker_buses:
+                    self.poll_bus(bus_id)
+            except Exception as e:
+                # Поток продолжает работу, ошибка поднимается в cycle() на ядре 0
+                self.worker_error = e
+            finally:
+                self._done.release()
+        self._done.release()
+
+    def cycle(self):
+        t_ms = self.clock()
+        if self.worker_buses:
+            self._go.release()
+        try:
+            for bus_id in self.buses:
+                if bus_id not in self.worker_buses:
+                    self.poll_bus(bus_id)
+        finally:
+            if self.worker_buses:
+                self._done.acquire()
+        if self.worker_error is not None:
+            error, self.worker_error = self.worker_error, None
+            raise error
+        merged = {}
+        for bus_id in self.buses:
+            for snap in self.results[bus_id]:
+                merged[(bus_id, snap.addr)] = snap
+        return FleetSnapshot(t_ms, merged)
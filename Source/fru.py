@@ -0,0 +1,206 @@
+"""
+Разбор образа IPMI FRU (Platform Management FRU Information Storage Definition v1.0).
+"""
+
+FRU_HEADER_LEN = 8
+END_OF_FIELDS = 0xC1
+
+# (индекс смещения в общем заголовке, область, поля по порядку)
+AREAS = (
+    (2, "chassis", ("part_number", "serial")),
+    (3, "board", ("manufacturer", "product", "serial", "part_number", "fru_file_id")),
+    (4, "product", ("manufacturer", "product", "part_number", "version", "serial",
+                    "asset_tag", "fru_file_id")),
+)
+
+RECORD_TYPES = {
+    0x00: "Power Supply Information",
+    0x01: "DC Output",
+    0x02: "DC Load",
+    0x03: "Management Access",
+    0x04: "Base Compatibility",
+    0x05: "Extended Compatibility",
+}
+
+BCD_PLUS = "0123456789 -.???"
+MAX_RECORDS = 32  # защита от зацикленного списка MultiRecord
+
+
+def zero_sum(data, start, length):
+    total = 0
+    for i in range(start, start + length):
+        total += data[i]
+    return total & 0xFF == 0
+
+
+def header_ok(header):
+    return len(header) >= FRU_HEADER_LEN and header[0] == 0x01 and zero_sum(header, 0, FRU_HEADER_LEN)
+
+
+def fru_signature(read, size):
+    """
+    Подпись образа: общий заголовок, байты длины и контрольной суммы областей
+    chassis/board/product и заголовки записей MultiRecord. read(offset, length) -> байты или None.
+    Возвращает bytes или None, если заголовок не похож на FRU.
+    Подпись не различает блоки (одинаковые длины и суммы при разных серийных номерах) -
+    она лишь подтверждает, что образ того же блока не изменился.
+    """
+    header = read(0, FRU_HEADER_LEN)
+    if header is None or not header_ok(header):
+        return None
+    sig = bytearray(header)
+    for index, kind, names in AREAS:
+        offset = header[index] * 8
+        if not offset:
+            continue
+        if offset + 2 > size:
+            return None
+        head = read(offset, 2)
+        if head is None or not head[1] or offset + head[1] * 8 > size:
+            return None
+        last = read(offset + head[1] * 8 - 1, 1)
+        if last is None:
+            return None
+        sig.append(head[1])
+        sig.append(last[0])
+    offset = header[5] * 8
+    for _ in range(MAX_RECORDS if offset else 0):
+        if offset + 5 > size:
+            break
+        record = read(offset, 5)
+        if record is None:
+            return None
+        sig.extend(record)
+        if record[1] & 0x80 or not zero_sum(record, 0, 5):
+            break
+        offset += 5 + record[2]
+    return bytes(sig)
+
+
+def fru_date(minutes):
+    """Дата изготовления board: минуты с 1996-01-01 00:00."""
+    days, rest = divmod(minutes, 1440)
+    year = 1996
+    while True:
+        leap = year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+        if days < 365 + leap:
+            break
+        days -= 365 + leap
+        year += 1
+    month = 1
+    for length in (31, 28 + leap, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31):
+        if days < length:
+            break
+        days -= length
+        month += 1
+    return f"{year:04d}-{month:02d}-{days + 1:02d} {rest // 60:02d}:{rest % 60:02d}"
+
+
+def decode_field(data, i):
+    """
+    Поле тип/длина: биты 7:6 - тип (0 двоичное, 1 BCD plus, 2 6-битный ASCII, 3 текст),
+    биты 5:0 - длина. Возвращает (значение, индекс следующего поля).
+    """
+    kind = data[i] >> 6
+    end = i + 1 + (data[i] & 0x3F)
+    raw = data[i + 1:end]
+    if kind == 3:
+        value = "".join(chr(b) for b in raw if 0x20 <= b < 0x7F).strip()
+    elif kind == 2:
+        chars = []
+        for j in range(0, len(raw) - 2, 3):
+            bits = raw[j] | (raw[j + 1] << 8) | (raw[j + 2] << 16)
+            for k in range(4):
+                chars.append(chr(0x20 + ((bits >> (6 * k)) & 0x3F)))
+        value = "".join(chars).strip()
+    elif kind == 1:
+        value = "".join(BCD_PLUS[b >> 4] + BCD_PLUS[b & 0x0F] for b in raw)
+    else:
+        value = "".join(f"{b:02X}" for b in raw)
+    return value, end
+
+
+def parse_area(image, offset, kind, names):
+    length = image[offset + 1] * 8 if offset + 2 <= len(image) else 0
+    if not length or offset + length > len(image):
+        return {"offset": offset, "error": "bad area length"}
+    area = {"offset": offset, "length": length, "checksum_ok": zero_sum(image, offset, length)}
+    i = offset + 2
+    if kind == "chassis":
+        area["type"] = image[i]
+        i += 1
+    elif kind == "board":
+        area["language"] = image[i]
+        area["mfg_date"] = fru_date(image[i + 1] | (image[i + 2] << 8) | (image[i + 3] << 16))
+        i += 4
+    else:
+        area["language"] = image[i]
+        i += 1
+    end = offset + length - 1
+    custom = []
+    field = 0
+    while i < end and image[i] != END_OF_FIELDS:
+        value, i = decode_field(image, i)
+        if field < len(names):
+            area[names[field]] = value
+        else:
+            custom.append(value)
+        field += 1
+    area["custom"] = custom
+    return area
+
+
+def decode_record(kind, data):
+    """Основные поля записей блока питания; остальные типы - только сырые байты."""
+    if kind == 0x00 and len(data) >= 24:
+        return {
+            "capacity_w": data[0] | ((data[1] & 0x0F) << 8),
+            "peak_va": data[2] | (data[3] << 8),
+            "input_v_range_1": ((data[6] | (data[7] << 8)) / 100, (data[8] | (data[9] << 8)) / 100),
+            "input_v_range_2": ((data[10] | (data[11] << 8)) / 100, (data[12] | (data[13] << 8)) / 100),
+            "input_hz": (data[14], data[15]),
+        }
+    if kind == 0x01 and len(data) >= 13:
+        nominal = data[1] | (data[2] << 8)
+        if nominal & 0x8000:
+            nominal -= 0x10000
+        return {
+            "output": data[0] & 0x0F,
+            "nominal_v": nominal / 100,
+            "max_current_a": (data[11] | (data[12] << 8)) / 1000,
+        }
+    return {}
+
+
+def parse_multirecords(image, offset):
+    records = []
+    for _ in range(MAX_RECORDS):
+        if offset + 5 > len(image):
+            break
+        kind, fmt, length, record_sum = image[offset], image[offset + 1], image[offset + 2], image[offset + 3]
+        data = image[offset + 5:offset + 5 + length]
+        ok = zero_sum(image, offset, 5) and (sum(data) + record_sum) & 0xFF == 0 and len(data) == length
+        record = {"type": kind, "name": RECORD_TYPES.get(kind, "OEM"), "checksum_ok": ok, "data": bytes(data)}
+        record.update(decode_record(kind, data))
+        records.append(record)
+        if fmt & 0x80 or not ok:
+            break
+        offset += 5 + length
+    return records
+
+
+def parse_fru(image):
+    """
+    Разбирает образ FRU. Возвращает словарь областей (chassis, board, product,
+    multirecord) или None, если общий заголовок неверен.
+    """
+    if not header_ok(image):
+        return None
+    result = {}
+    for index, kind, names in AREAS:
+        offset = image[index] * 8
+        if offset:
+            result[kind] = parse_area(image, offset, kind, names)
+    if image[5]:
+        result["multirecord"] = parse_multirecords(image, image[5] * 8)
+    return result
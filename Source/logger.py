@@ -0,0 +1,194 @@
+"""
+Журнал телеметрии на flash для автономной работы (стенд прогона без хоста).
+
+Файл telemetry_NNN.bin: заголовок, затем записи фиксированного размера (little-endian):
+    мс от начала сеанса (u32) | шина (u8) | addr (u8) | VOUT_MODE (u8) | резерв (u8) |
+    STATUS_WORD (u16) | маска ошибок чтения (u16: бит i - канал i, бит 15 - STATUS_WORD) |
+    сырые слова каналов (u16 * N)
+Поток файла копится в буфере размером с сектор flash и записывается целыми секторами.
+"""
+import os
+import select
+import struct
+import sys
+import time
+from commands import VOUT_MODE, STATUS_WORD, READ_VIN, READ_IIN, READ_VOUT, READ_IOUT, \
+    READ_PIN, READ_POUT, READ_TEMPERATURE_1
+from compat import ticks_ms, ticks_us, ticks_diff, ticks_add, sleep_ms
+
+LOG_MAGIC = b"PMBL"
+LOG_VERSION = 2
+LOG_PREFIX = "telemetry_"
+LOG_SUFFIX = ".bin"
+# magic, версия, каналов, размер записи, сектор, год эпохи time(), time() при старте, период мс;
+# далее коды команд каналов (u8 * N) и идентификаторы декодеров (u8 * N)
+HEADER_FORMAT = "<4sBBHHHII"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+RECORD_HEAD = 12  # слова STATUS_WORD и каналов выровнены на 2 байта
+STATUS_ERROR = 0x8000
+MAX_CHANNELS = 15
+SECTOR_SIZE = 4096             # блок LittleFS на RP2040
+FREE_RESERVE = 4 * SECTOR_SIZE  # не заполнять flash до конца
+
+AUTOLOG_PATH = "autolog.json"  # сеанс, запускаемый main.py при включении
+
+LOG_CMDS = (READ_VIN, READ_IIN, READ_VOUT, READ_IOUT, READ_PIN, READ_POUT, READ_TEMPERATURE_1)
+
+
+def next_log_path():
+    names = os.listdir()
+    index = 0
+    while f"{LOG_PREFIX}{index:03d}{LOG_SUFFIX}" in names:
+        index += 1
+    return f"{LOG_PREFIX}{index:03d}{LOG_SUFFIX}"
+
+
+def log_files():
+    return sorted(name for name in os.listdir() if name.startswith(LOG_PREFIX) and name.endswith(LOG_SUFFIX))
+
+
+def free_bytes():
+    try:
+        st = os.statvfs("/")
+    except (AttributeError, OSError):
+        return None
+    return st[0] * st[4]
+
+
+def encode_header(cmds, record_size, sector, period_ms):
+    header = struct.pack(HEADER_FORMAT, LOG_MAGIC, LOG_VERSION, len(cmds), record_size, sector,
+                         time.gmtime(0)[0], int(time.time()), period_ms)
+    return header + bytes(cmd.code for cmd in cmds) + bytes(cmd.decoder for cmd in cmds)
+
+
+class FlashLogger:
+    """
+    Запись строится в заранее выделенном bytearray (чтения идут прямо в него),
+    поток копится в буфере сектора; file.write вызывается только целыми секторами.
+    """
+
+    def __init__(self, cmds, path=None, period_ms=0, sector=SECTOR_SIZE, max_bytes=None):
+        if not cmds or len(cmds) > MAX_CHANNELS:
+            raise ValueError(f"1..{MAX_CHANNELS} channels required")
+        for cmd in cmds:
+            if cmd.size not in (1, 2):
+                raise ValueError(f"{cmd.name} is not a byte/word command")
+        self.cmds = tuple(cmds)
+        self.record_size = RECORD_HEAD + 2 * len(cmds)
+        self.record = bytearray(self.record_size)
+        mv = memoryview(self.record)
+        self.status = mv[8:10]
+        self.views = [mv[RECORD_HEAD + 2 * i:RECORD_HEAD + 2 * i + cmd.size] for i, cmd in enumerate(cmds)]
+        self.buf = bytearray(sector)
+        self.fill = 0
+        if max_bytes is None:
+            free = free_bytes()
+            max_bytes = free - FREE_RESERVE if free is not None else 0
+        self.max_bytes = max_bytes  # 0 - без ограничения
+        self.path = path or next_log_path()
+        self.file = open(self.path, "wb")
+        self.written = 0
+        self.records = 0
+        self.sectors = 0
+        self.max_stall_us = 0  # самая долгая запись сектора
+        self.t_ms = 0
+        self.t_last = ticks_ms()
+        self.append(encode_header(self.cmds, self.record_size, sector, period_ms))
+
+    def write_sector(self):
+        t0 = ticks_us()
+        self.file.write(self.buf)
+        self.file.flush()
+        self.max_stall_us = max(self.max_stall_us, ticks_diff(ticks_us(), t0))
+        self.written += len(self.buf)
+        self.sectors += 1
+        self.fill = 0
+
+    def append(self, data):
+        mv = memoryview(data)
+        buf = self.buf
+        pos = 0
+        while pos < len(mv):
+            chunk = min(len(mv) - pos, len(buf) - self.fill)
+            buf[self.fill:self.fill + chunk] = mv[pos:pos + chunk]
+            self.fill += chunk
+            pos += chunk
+            if self.fill == len(buf):
+                self.write_sector()
+
+    def log(self, device, bus_id=0):
+        """
+        Читает каналы блока device на шине bus_id в запись и добавляет её в поток.
+        Возвращает False, когда место под журнал исчерпано.
+        """
+        rec = self.record
+        now = ticks_ms()
+        self.t_ms = (self.t_ms + ticks_diff(now, self.t_last)) & 0xFFFFFFFF
+        self.t_last = now
+        t = self.t_ms
+        rec[0] = t & 0xFF
+        rec[1] = (t >> 8) & 0xFF
+        rec[2] = (t >> 16) & 0xFF
+        rec[3] = t >> 24
+        rec[4] = bus_id
+        rec[5] = device.addr
+        mode = device.read_cached(VOUT_MODE.code, 1)
+        rec[6] = mode[0] if mode else 0
+        errors = 0
+        if not device.read_into(STATUS_WORD.code, self.status):
+            rec[8] = rec[9] = 0
+            errors |= STATUS_ERROR
+        views = self.views
+        for i in range(len(views)):
+            offset = RECORD_HEAD + 2 * i
+            rec[offset + 1] = 0  # старший байт для Read Byte
+            if not device.read_into(self.cmds[i].code, views[i]):
+                rec[offset] = 0
+                errors |= 1 << i
+        rec[10] = errors & 0xFF
+        rec[11] = errors >> 8
+        self.append(rec)
+        self.records += 1
+        return not self.max_bytes or self.written + self.fill + self.record_size <= self.max_bytes
+
+    def close(self):
+        if self.fill:
+            self.file.write(memoryview(self.buf)[:self.fill])
+            self.written += self.fill
+            self.fill = 0
+        self.file.close()
+
+    def run(self, units, period_ms, bus_clocks=None, service=None):
+        """
+        Сеанс записи до нажатия клавиши или исчерпания места.
+        units - [(bus_id, device, freq)]; freq - частота шины для блока (None - базовая).
+        service - вызывается после каждого цикла записи (обслуживание SMBALERT#).
+        """
+        bus_clocks = bus_clocks or {}
+        stdin = select.poll()
+        stdin.register(sys.stdin, select.POLLIN)
+        due = ticks_ms()
+        full = False
+        try:
+            while not full and not stdin.poll(0):
+                now = ticks_ms()
+                if ticks_diff(now, due) < 0:
+                    sleep_ms(1)
+                    continue
+                due = ticks_add(due, period_ms)
+                if ticks_diff(now, due) >= 0:
+                    due = ticks_add(now, period_ms)  # пропущенные циклы не догоняются
+                for bus_id, device, freq in units:
+                    clock = bus_clocks.get(bus_id)
+                    if clock is not None:
+                        clock.set(freq or clock.base)
+                    if not self.log(device, bus_id):
+                        full = True
+                        break
+                if service is not None:
+                    service()
+        finally:
+            self.close()
+        if not full:
+            sys.stdin.read(1)
+        return full
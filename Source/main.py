@@ -1,10 +1,13 @@
 from machine import I2C, Pin
+from calibrate import BASE_FREQ
 from pmbus_manager import PMBusManager
 
 # Настройка I2C
-i2c = I2C(0, scl=Pin(1), sda=Pin(0), freq=50000)
+i2c = I2C(0, scl=Pin(1), sda=Pin(0), freq=BASE_FREQ)
+i2c1 = I2C(1, scl=Pin(3), sda=Pin(2), freq=BASE_FREQ)
 
 # Запуск менеджера
-manager = PMBusManager(i2c)
+manager = PMBusManager(i2c, i2c1)
+manager.autolog()  # сеанс журнала по autolog.json, если он задан командой 'log boot'
 manager.run()
 
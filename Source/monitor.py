@@ -0,0 +1,167 @@
+try:
+    from machine import Timer
+except ImportError:
+    Timer = None  # хост: тики подаются вызовом _tick() вручную
+from array import array
+from compat import ticks_us
+import struct
+import select
+import sys
+
+# Формат кадра: SYNC(2) | LEN(1) | TYPE(1) | PAYLOAD(LEN)
+FRAME_SYNC = b"\xA5\x5A"
+FRAME_SAMPLE = 0x01     # ticks_us(u32) | error_mask(u16) | word(u16) * N
+FRAME_COUNTERS = 0x02   # samples(u32) | dropped(u32) | overrun(u32)
+
+MAX_CHANNELS = 16
+COUNTERS_EVERY = 100    # как часто отправлять счётчики (в кадрах)
+TICKS_MASK = 0xFFFFFF   # счётчик тиков остаётся small int, в прерывании нет выделений памяти
+
+
+class RingBuffer:
+    def __init__(self, capacity, width):
+        self.capacity = capacity
+        self.width = width
+        self.words = array("H", bytes(2 * capacity * width))
+        self.stamps = array("I", bytes(4 * capacity))
+        self.errors = array("H", bytes(2 * capacity))
+        self.head = 0
+        self.count = 0
+        self.overrun = 0
+
+    def slot(self):
+        """Возвращает индекс свободной записи или -1, если буфер заполнен."""
+        if self.count == self.capacity:
+            self.overrun += 1
+            return -1
+        return (self.head + self.count) % self.capacity
+
+    def commit(self):
+        self.count += 1
+
+    def pop(self):
+        index = self.head
+        self.head = (self.head + 1) % self.capacity
+        self.count -= 1
+        return index
+
+
+class Monitor:
+    def __init__(self, device, cmds, rate, capacity=64, out=None, alert=None):
+        if not cmds or len(cmds) > MAX_CHANNELS:
+            raise ValueError(f"1..{MAX_CHANNELS} channels required")
+        for cmd in cmds:
+            if cmd.size not in (1, 2):
+                raise ValueError(f"{cmd.name} is not a byte/word command")
+        self.device = device
+        self.cmds = tuple(cmds)
+        self.rate = rate
+        self.ring = RingBuffer(capacity, len(cmds))
+        self.rx = [bytearray(cmd.size) for cmd in cmds]
+        self.out = out if out is not None else sys.stdout.buffer
+        self.frame = bytearray(4 + 6 + 2 * len(cmds))
+        self.frame[0:2] = FRAME_SYNC
+        self.frame[2] = len(self.frame) - 4
+        self.frame[3] = FRAME_SAMPLE
+        self.counters_frame = bytearray(4 + 12)
+        self.counters_frame[0:2] = FRAME_SYNC
+        self.counters_frame[2] = 12
+        self.counters_frame[3] = FRAME_COUNTERS
+        self.alert = alert
+        self.timer = None
+        # Счётчик тиков пишет только прерывание таймера, счётчик обработанных - только poll(),
+        # поэтому тик между чтением и записью не теряется
+        self.ticks = 0
+        self.consumed = 0
+        self.samples = 0
+        self.dropped = 0
+        self.sent = 0
+
+    def _tick(self, _timer):
+        self.ticks = (self.ticks + 1) & TICKS_MASK
+
+    def start(self):
+        self.ticks = 0
+        self.consumed = 0
+        self.timer = Timer(mode=Timer.PERIODIC, freq=self.rate, callback=self._tick)
+
+    def stop(self):
+        if self.timer is not None:
+            self.timer.deinit()
+            self.timer = None
+        self.drain()
+        self.send_counters()
+
+    def sample(self):
+        ring = self.ring
+        index = ring.slot()
+        if index < 0:
+            return
+        base = index * ring.width
+        mask = 0
+        device = self.device
+        cmds = self.cmds
+        rx = self.rx
+        words = ring.words
+        for i in range(len(cmds)):
+            buf = rx[i]
+            # Одна попытка: повтор с паузой 10 мс сдвинул бы следующий тик,
+            # неудачное чтение остаётся отмеченным в маске ошибок отсчёта
+            if device.read_into(cmds[i].code, buf, 1):
+                words[base + i] = buf[0] if len(buf) == 1 else buf[0] | (buf[1] << 8)
+            else:
+                words[base + i] = 0
+                mask |= 1 << i
+        ring.stamps[index] = ticks_us() & 0xFFFFFFFF
+        ring.errors[index] = mask
+        ring.commit()
+        self.samples += 1
+
+    def send_one(self):
+        ring = self.ring
+        frame = self.frame
+        index = ring.pop()
+        struct.pack_into("<IH", frame, 4, ring.stamps[index], ring.errors[index])
+        base = index * ring.width
+        for i in range(ring.width):
+            struct.pack_into("<H", frame, 10 + 2 * i, ring.words[base + i])
+        self.out.write(frame)
+        self.sent += 1
+        if self.sent % COUNTERS_EVERY == 0:
+            self.send_counters()
+
+    def drain(self):
+        while self.ring.count:
+            self.send_one()
+
+    def send_counters(self):
+        struct.pack_into("<III", self.counters_frame, 4,
+                         self.samples, self.dropped, self.ring.overrun)
+        self.out.write(self.counters_frame)
+
+    def poll(self):
+        # Опрос шины имеет приоритет, кадры отправляются в паузах между тиками,
+        # поэтому задержки USB CDC накапливаются в кольцевом буфере
+        ticks = self.ticks
+        due = (ticks - self.consumed) & TICKS_MASK
+        if due:
+            self.consumed = ticks
+            # Пропущенные тики таймера считаем потерянными отсчётами
+            if due > 1:
+                self.dropped += due - 1
+            self.sample()
+        elif self.ring.count:
+            self.send_one()
+        elif self.alert is not None and self.alert.pending:
+            self.alert.service()
+
+    def run(self):
+        stdin = select.poll()
+        stdin.register(sys.stdin, select.POLLIN)
+        self.start()
+        try:
+            while not stdin.poll(0):
+                self.poll()
+        finally:
+            self.stop()
+            sys.stdin.read(1)
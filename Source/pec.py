@@ -0,0 +1,45 @@
+# CRC-8 (полином 0x07) для SMBus PEC, табличная реализация
+
+def _make_table():
+    table = bytearray(256)
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table[i] = crc
+    return bytes(table)
+
+
+CRC8_TABLE = _make_table()
+
+
+def crc8(data, crc=0, length=-1):
+    """
+    Продолжает расчёт CRC-8 с состояния crc по первым length байтам data
+    (по умолчанию - по всем). Позволяет считать PEC кадра по частям
+    без склейки и срезов буферов; цикл по индексам не создаёт объектов.
+    """
+    table = CRC8_TABLE
+    if length < 0:
+        length = len(data)
+    for i in range(length):
+        crc = table[crc ^ data[i]]
+    return crc
+
+
+def crc8_byte(crc, byte):
+    return CRC8_TABLE[crc ^ byte]
+
+
+def crc8_bitwise(data):
+    """Побитовая реализация (исходный PMBusDevice.calc_pec), эталон для проверки и бенчмарка."""
+    crc = 0
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            if crc & 0x80:
+                crc = (crc << 1) ^ 0x07
+            else:
+                crc <<= 1
+        crc &= 0xFF
+    return crc
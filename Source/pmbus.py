@@ -1,19 +1,265 @@
-from machine import I2C
-import time
+try:
+    from machine import I2C
+except ImportError:
+    I2C = object  # хост: вместо machine.I2C используется эмулятор шины
+from cache import MetadataCache, CACHED_CODES
+from compat import sleep_ms, ticks_us
+from stats import BusStats
+from pec import crc8, crc8_byte
+from commands import command_by_code
+
+PAGE_CODE = 0x00
+PAGE_PLUS_WRITE_CODE = 0x05
+PAGE_PLUS_READ_CODE = 0x06
+QUERY_CODE = 0x1A
+COEFFICIENTS_CODE = 0x30
 
 class PMBusDevice:
     def __init__(self, i2c: I2C):
         self.i2c = i2c
         self.addr = None
+        self.cache = MetadataCache()
+        self.unit_stats = {}  # {addr: BusStats}
+        self.pec = False  # режим "PEC всегда": PEC в каждой транзакции
+        self.retries = 3  # попыток чтения по умолчанию (профиль шины блока может изменить)
+        self._rx = {}     # внутренние буферы приёма по длине (PEC, счётчик блока)
+        self._buffers = {}
+        self._page_plus = bytearray((PAGE_PLUS_READ_CODE, 2, 0, 0))
+
+    @property
+    def stats(self):
+        """Статистика текущего адреса: у каждого блока свои счётчики."""
+        stats = self.unit_stats.get(self.addr)
+        if stats is None:
+            stats = self.unit_stats[self.addr] = BusStats()
+        return stats
+
+    def rx_buffer(self, length):
+        buf = self._rx.get(length)
+        if buf is None:
+            buf = self._rx[length] = bytearray(length)
+        return buf
+
+    def buffer(self, length):
+        """Заранее выделенный буфер заданной длины для вызывающего кода."""
+        buf = self._buffers.get(length)
+        if buf is None:
+            buf = self._buffers[length] = bytearray(length)
+        return buf
 
-    def read_bytes(self, cmd, length, retries=3):
-        for _ in range(retries):
+    def read_prefix_pec(self, cmd):
+        """CRC заголовка чтения: адрес (запись), команда, адрес (чтение)."""
+        addr_wr = self.addr << 1
+        return crc8_byte(crc8_byte(crc8_byte(0, addr_wr), cmd), addr_wr | 1)
+
+    def read_bytes(self, cmd, length, retries=None):
+        stats = self.stats
+        if retries is None:
+            retries = self.retries
+        t0 = ticks_us()
+        for attempt in range(retries):
             try:
-                return self.i2c.readfrom_mem(self.addr, cmd, length)
-            except:
-                time.sleep_ms(10)
+                if self.pec:
+                    result = self.i2c.readfrom_mem(self.addr, cmd, length + 1)
+                    if crc8(result[:length], self.read_prefix_pec(cmd)) == result[length]:
+                        stats.record(cmd, t0)
+                        return result[:length]
+                    stats.record_pec(cmd)
+                else:
+                    data = self.i2c.readfrom_mem(self.addr, cmd, length)
+                    stats.record(cmd, t0)
+                    return data
+            except Exception as e:
+                stats.record_error(cmd, e)
+            if attempt + 1 < retries:
+                stats.record_retry(cmd)
+                sleep_ms(10)
+        stats.record(cmd, t0, False)
         return None
 
+    def read_into(self, cmd, buf, retries=None):
+        """
+        Read Byte/Word в буфер вызывающего (bytearray или memoryview).
+        Не создаёт объектов в куче при успешном чтении.
+        """
+        stats = self.stats
+        if retries is None:
+            retries = self.retries
+        i2c = self.i2c
+        n = len(buf)
+        t0 = ticks_us()
+        for attempt in range(retries):
+            try:
+                if self.pec:
+                    rx = self.rx_buffer(n + 1)
+                    i2c.readfrom_mem_into(self.addr, cmd, rx)
+                    if crc8(rx, self.read_prefix_pec(cmd), n) == rx[n]:
+                        for i in range(n):
+                            buf[i] = rx[i]
+                        stats.record(cmd, t0)
+                        return True
+                    stats.record_pec(cmd)
+                else:
+                    i2c.readfrom_mem_into(self.addr, cmd, buf)
+                    stats.record(cmd, t0)
+                    return True
+            except Exception as e:
+                stats.record_error(cmd, e)
+            if attempt + 1 < retries:
+                stats.record_retry(cmd)
+                sleep_ms(10)
+        stats.record(cmd, t0, False)
+        return False
+
+    def block_read_into(self, cmd, buf):
+        """
+        Block Read в буфер вызывающего (максимум len(buf) байт данных).
+        Возвращает число прочитанных байт или -1 при ошибке.
+        """
+        length = len(buf)
+        t0 = ticks_us()
+        rx = self.rx_buffer(length + (2 if self.pec else 1))
+        try:
+            self.i2c.readfrom_mem_into(self.addr, cmd, rx)
+        except Exception as e:
+            self.stats.record_error(cmd, e)
+            self.stats.record(cmd, t0, False)
+            return -1
+        count = rx[0]
+        if count > length:
+            if self.pec:
+                self.stats.record(cmd, t0, False)
+                return -1
+            count = length
+        if self.pec and crc8(rx, self.read_prefix_pec(cmd), count + 1) != rx[count + 1]:
+            self.stats.record_pec(cmd)
+            self.stats.record(cmd, t0, False)
+            return -1
+        for i in range(count):
+            buf[i] = rx[i + 1]
+        self.stats.record(cmd, t0)
+        return count
+
+    def read_command_into(self, cmd, buf, page=None, cached=True):
+        """
+        Чтение команды в буфер длиной cmd.size.
+        page - чтение через PAGE_PLUS_READ без переключения PAGE
+        (VOUT_MODE кэшируется для этой страницы); cached=False - метаданные читаются с шины.
+        Возвращает число прочитанных байт (0 - ошибка). Ошибки не печатаются:
+        путь используется бинарным протоколом, текст сломал бы поток кадров.
+        """
+        cached = cached and cmd.code in CACHED_CODES
+        if cached:
+            data = self.cache.get(self.addr, cmd.code, page)
+            if data is not None:
+                n = min(len(data), len(buf))
+                for i in range(n):
+                    buf[i] = data[i]
+                return n
+        if page is not None:
+            n = self.page_command_into(page, cmd, buf)
+        elif cmd.type == "Block Read":
+            n = self.block_read_into(cmd.code, buf)
+            n = n if n > 0 else 0
+        else:
+            n = len(buf) if self.read_into(cmd.code, buf) else 0
+        if cached and n:
+            self.cache.put(self.addr, cmd.code, buf[:n], page)
+        return n
+
+    def read_cached(self, cmd, length, block=False):
+        data = self.cache.get(self.addr, cmd)
+        if data is not None:
+            return data
+        if block:
+            data = self.block_read(cmd, length)
+        else:
+            data = self.read_bytes(cmd, length)
+        if data:
+            self.cache.put(self.addr, cmd, data)
+        return data
+
+    def read_command(self, cmd):
+        block = cmd.type == "Block Read"
+        if cmd.code in CACHED_CODES:
+            return self.read_cached(cmd.code, cmd.size, block)
+        if block:
+            return self.block_read(cmd.code, cmd.size)
+        return self.read_bytes(cmd.code, cmd.size)
+
+    def query(self, code):
+        """
+        QUERY (0x1A): Block Write-Block Read Process Call.
+        Возвращает байт ответа (бит 7 - команда поддерживается) или None.
+        """
+        request = bytes([QUERY_CODE, 1, code])
+        t0 = ticks_us()
+        try:
+            self.i2c.writeto(self.addr, request, False)
+            result = self.i2c.readfrom(self.addr, 3 if self.pec else 2)
+        except Exception as e:
+            self.stats.record_error(QUERY_CODE, e)
+            self.stats.record(QUERY_CODE, t0, False)
+            return None
+        if self.pec and self.process_call_pec(request, result[:2]) != result[2]:
+            self.stats.record_pec(QUERY_CODE)
+            self.stats.record(QUERY_CODE, t0, False)
+            return None
+        self.stats.record(QUERY_CODE, t0)
+        if result[0] != 1:
+            return None
+        return result[1]
+
+    def coefficients(self, code, read=True):
+        """
+        COEFFICIENTS (0x30): Block Write-Block Read Process Call [0x30, 2, code, 1 - чтение / 0 - запись].
+        Ответ: счётчик 5, m (s16), b (s16), R (s8). Возвращает (m, b, R) или None.
+        """
+        request = bytes([COEFFICIENTS_CODE, 2, code, 1 if read else 0])
+        t0 = ticks_us()
+        try:
+            self.i2c.writeto(self.addr, request, False)
+            result = self.i2c.readfrom(self.addr, 7 if self.pec else 6)
+        except Exception as e:
+            self.stats.record_error(COEFFICIENTS_CODE, e)
+            self.stats.record(COEFFICIENTS_CODE, t0, False)
+            return None
+        if self.pec and self.process_call_pec(request, result, 6) != result[6]:
+            self.stats.record_pec(COEFFICIENTS_CODE)
+            self.stats.record(COEFFICIENTS_CODE, t0, False)
+            return None
+        self.stats.record(COEFFICIENTS_CODE, t0)
+        if result[0] != 5:
+            return None
+        m = result[1] | (result[2] << 8)
+        b = result[3] | (result[4] << 8)
+        r = result[5]
+        return (m - 0x10000 if m & 0x8000 else m,
+                b - 0x10000 if b & 0x8000 else b,
+                r - 0x100 if r & 0x80 else r)
+
+    def process_call_pec(self, request, response, length=-1):
+        """PEC для Block Write-Block Read Process Call (QUERY, COEFFICIENTS, PAGE_PLUS_READ)."""
+        addr_wr = self.addr << 1
+        crc = crc8(request, crc8_byte(0, addr_wr))
+        return crc8(response, crc8_byte(crc, addr_wr | 1), length)
+
+    def send_byte(self, cmd):
+        self.cache.on_write(self.addr, cmd)
+        buf = bytes([cmd])
+        if self.pec:
+            buf += bytes([crc8(buf, crc8_byte(0, self.addr << 1))])
+        t0 = ticks_us()
+        try:
+            self.i2c.writeto(self.addr, buf)
+            self.stats.record(cmd, t0)
+            return True
+        except Exception as e:
+            self.stats.record_error(cmd, e)
+            self.stats.record(cmd, t0, False)
+            print("Send Byte Error:", e)
+            return False
+
     def write_bytes(self, cmd, data, length):
         if isinstance(data, int):
             data_bytes = data.to_bytes(length, 'little')
@@ -23,61 +269,87 @@ class PMBusDevice:
             data_bytes = bytes(data[:length])
         else:
             raise TypeError("Unsupported data type")
+        if self.pec:
+            return self.write_bytes_with_pec(cmd, data_bytes, length)
+        self.cache.on_write(self.addr, cmd)
+        t0 = ticks_us()
         try:
             self.i2c.writeto_mem(self.addr, cmd, data_bytes)
+            self.stats.record(cmd, t0)
+            if cmd == PAGE_CODE:
+                self.cache.set_page(self.addr, data_bytes[0])
             return True
         except Exception as e:
+            self.stats.record_error(cmd, e)
+            self.stats.record(cmd, t0, False)
             print("I2C Write Error:", e)
             return False
 
     def block_read(self, cmd, length):
+        """
+        SMBus Block Read: первым байтом приходит счётчик, затем данные
+        (и PEC в режиме self.pec). Возвращает только данные.
+        """
+        t0 = ticks_us()
         try:
-            packet = bytes(cmd)
-            bytes_block = self.i2c.readfrom_mem(self.addr, cmd, length)
-            
-            return bytes_block
+            raw = self.i2c.readfrom_mem(self.addr, cmd, length + (2 if self.pec else 1))
         except Exception as e:
+            self.stats.record_error(cmd, e)
+            self.stats.record(cmd, t0, False)
             print("Block Read Error:", e)
             return None
+        count = raw[0]
+        if count > length:
+            if self.pec:
+                self.stats.record(cmd, t0, False)
+                print(f"Block Read Error: count {count} > {length}")
+                return None
+            count = length
+        if self.pec and crc8(raw[:count + 1], self.read_prefix_pec(cmd)) != raw[count + 1]:
+            self.stats.record_pec(cmd)
+            self.stats.record(cmd, t0, False)
+            print(f"[!] PEC mismatch in block read 0x{cmd:02X}")
+            return None
+        self.stats.record(cmd, t0)
+        return raw[1:count + 1]
 
     def block_write(self, cmd, data):
         if len(data) > 255:
             raise ValueError("Block too large")
+        self.cache.on_write(self.addr, cmd)
+        t0 = ticks_us()
         try:
-            buf = bytes([cmd, len(data)] + data)
+            buf = bytes([cmd, len(data)] + list(data))
+            if self.pec:
+                buf += bytes([crc8(buf, crc8_byte(0, self.addr << 1))])
             self.i2c.writeto(self.addr, buf)
+            self.stats.record(cmd, t0)
             return True
         except Exception as e:
+            self.stats.record_error(cmd, e)
+            self.stats.record(cmd, t0, False)
             print("Block Write Error:", e)
             return False
 
     def calc_pec(self, data: bytes) -> int:
-        crc = 0
-        for byte in data:
-            crc ^= byte
-            for _ in range(8):
-                if crc & 0x80:
-                    crc = (crc << 1) ^ 0x07
-                else:
-                    crc <<= 1
-            crc &= 0xFF
-        return crc
+        return crc8(data)
 
     def read_bytes_with_pec(self, cmd, length):
-        addr_wr = self.addr << 1
-        addr_rd = (self.addr << 1) | 1
-        pec_wr = self.calc_pec(bytes([addr_wr, cmd]))
+        t0 = ticks_us()
         try:
-            self.i2c.writeto(self.addr, bytes([cmd, pec_wr]))
-            result = self.i2c.readfrom(self.addr, length + 1)
-            data, received_pec = result[:-1], result[-1]
-            packet = bytes([addr_wr, cmd, addr_rd]) + data
-            calc = self.calc_pec(packet)
+            result = self.i2c.readfrom_mem(self.addr, cmd, length + 1)
+            data, received_pec = result[:length], result[length]
+            calc = crc8(data, self.read_prefix_pec(cmd))
             if calc != received_pec:
+                self.stats.record_pec(cmd)
+                self.stats.record(cmd, t0, False)
                 print(f"[!] PEC mismatch: got 0x{received_pec:02X}, expected 0x{calc:02X}")
                 return None
+            self.stats.record(cmd, t0)
             return data
         except Exception as e:
+            self.stats.record_error(cmd, e)
+            self.stats.record(cmd, t0, False)
             print("Read with PEC error:", e)
             return None
 
@@ -91,30 +363,102 @@ class PMBusDevice:
         else:
             raise TypeError("Unsupported data type")
 
-        addr_wr = self.addr << 1
         # Для вычисления PEC включаем адрес и команду
-        packet_for_crc = bytes([addr_wr, cmd]) + data_bytes
-        pec = self.calc_pec(packet_for_crc)
+        pec = crc8(data_bytes, crc8_byte(crc8_byte(0, self.addr << 1), cmd))
+
+        self.cache.on_write(self.addr, cmd)
 
         # Но на I2C шину отправляем ТОЛЬКО команду + данные + PEC
+        t0 = ticks_us()
         try:
             self.i2c.writeto(self.addr, bytes([cmd]) + data_bytes + bytes([pec]))
+            self.stats.record(cmd, t0)
+            if cmd == PAGE_CODE:
+                self.cache.set_page(self.addr, data_bytes[0])
             return True
         except Exception as e:
+            self.stats.record_error(cmd, e)
+            self.stats.record(cmd, t0, False)
             print("Write with PEC error:", e)
             return False
 
-        
-    def page_plus_read(self, byte_count, page, command):
-        addr_wr = self.addr << 1
-        page_plus_read_cmd = 0x06
-        packet = bytes([page_plus_read_cmd, byte_count, page, command])
+
+    def set_page(self, page):
+        """PAGE (0x00): выбор страницы для последующих команд."""
+        return self.write_bytes(PAGE_CODE, page, 1)
+
+    def page_plus_read_into(self, page, cmd, buf):
+        """
+        PAGE_PLUS_READ (0x06): Block Write-Block Read Process Call
+        [0x06, 2, PAGE, cmd] -> счётчик, данные команды (и PEC в режиме self.pec).
+        Возвращает число прочитанных байт или -1 при ошибке.
+        """
+        length = len(buf)
+        request = self._page_plus
+        request[2] = page
+        request[3] = cmd
+        rx = self.rx_buffer(length + (2 if self.pec else 1))
+        t0 = ticks_us()
         try:
-            self.i2c.writeto(self.addr, packet, False)
+            self.i2c.writeto(self.addr, request, False)
+            self.i2c.readfrom_into(self.addr, rx)
         except Exception as e:
-            print(f"Write PAGE PLUS READ ERROR {e}")
-            
+            self.stats.record_error(PAGE_PLUS_READ_CODE, e)
+            self.stats.record(PAGE_PLUS_READ_CODE, t0, False)
+            return -1
+        count = rx[0]
+        if not 0 < count <= length:
+            self.stats.record(PAGE_PLUS_READ_CODE, t0, False)
+            return -1
+        if self.pec and self.process_call_pec(request, rx, count + 1) != rx[count + 1]:
+            self.stats.record_pec(PAGE_PLUS_READ_CODE)
+            self.stats.record(PAGE_PLUS_READ_CODE, t0, False)
+            return -1
+        for i in range(count):
+            buf[i] = rx[i + 1]
+        self.stats.record(PAGE_PLUS_READ_CODE, t0)
+        return count
+
+    def page_command_into(self, page, cmd, buf):
+        """
+        Чтение команды реестра через PAGE_PLUS_READ. Для Read Byte/Word
+        счётчик ответа должен совпадать с cmd.size. Возвращает число байт (0 - ошибка).
+        """
+        n = self.page_plus_read_into(page, cmd.code, buf)
+        if n < 0 or (cmd.type != "Block Read" and n != cmd.size):
+            return 0
+        return n
+
+    def page_plus_read(self, page, cmd):
+        """PAGE_PLUS_READ с длиной ответа из реестра команд. Возвращает байты или None."""
+        command = command_by_code(cmd)
+        if command is None:
+            print(f"[!] Command 0x{cmd:02X} is not in the registry")
+            return None
+        buf = bytearray(command.size)
+        n = self.page_command_into(page, command, buf)
+        if not n:
+            print(f"PAGE_PLUS_READ Error: page {page}, command 0x{cmd:02X}")
+            return None
+        return bytes(buf[:n])
+
+    def page_plus_write(self, page, cmd, data):
+        """
+        PAGE_PLUS_WRITE (0x05): Block Write [0x05, 2 + N, PAGE, cmd, данные] (+ PEC).
+        """
+        if len(data) > 253:
+            raise ValueError("Block too large")
+        self.cache.on_write(self.addr, cmd, page)
+        buf = bytes([PAGE_PLUS_WRITE_CODE, len(data) + 2, page, cmd]) + bytes(data)
+        if self.pec:
+            buf += bytes([crc8(buf, crc8_byte(0, self.addr << 1))])
+        t0 = ticks_us()
         try:
-            return self.i2c.readfrom(self.addr, 4)
+            self.i2c.writeto(self.addr, buf)
+            self.stats.record(PAGE_PLUS_WRITE_CODE, t0)
+            return True
         except Exception as e:
-            print(f"Read PAGE PLUS READ ERROR {e}")
+            self.stats.record_error(PAGE_PLUS_WRITE_CODE, e)
+            self.stats.record(PAGE_PLUS_WRITE_CODE, t0, False)
+            print("PAGE_PLUS_WRITE Error:", e)
+            return False
@@ -1,135 +1,612 @@
 from commands import *
 from pmbus import PMBusDevice
-from decode import decode_linear_format, linear16_to_float
+from decode import decode_value, format_value, vout_exponent
+from snapshot import SnapshotReader, PagedReader
+from monitor import Monitor
+from fleet import FleetPoller
+from stats import BusStats, DUMP_FIELDS
+from discovery import CapabilityStore
+from status import STATUS_REGISTERS, read_fault_tree, register_value
+from alert import AlertHandler
+from protocol import ProtocolServer
+from energy import EnergyMeter, EnergyWindow
+from eeprom import Eeprom, FruStore
+from fru import parse_fru
+from calibrate import BusClock, BusProfileStore, resolve_profile
+from logger import FlashLogger, LOG_CMDS, AUTOLOG_PATH, log_files, free_bytes
+from compat import sleep_ms
+import sys
+import json
+import os
 import time
 
+ALERT_LOG_SIZE = 64
+
+
 class PMBusManager:
-    def __init__(self, i2c):
+    def __init__(self, i2c, i2c1=None):
         self.device = PMBusDevice(i2c)
+        buses = {0: i2c}
+        if i2c1 is not None:
+            buses[1] = i2c1
+        self.bus_clocks = {bus_id: BusClock(bus, bus_id) for bus_id, bus in buses.items()}
+        self.fleet = FleetPoller(buses, bus_clocks=self.bus_clocks)
+        self.bus_profiles = BusProfileStore()
+        self.unit_freq = None  # частота текущего блока по профилю
+        self.snapshot_reader = SnapshotReader(self.device, PARAM_CMDS)
+        self.capabilities = CapabilityStore()
+        self.energy = EnergyMeter(self.device)
+        self.alert = None
+        self.alert_log = []
+        self.supported = None
+        self.discovered = False
         self.pmbus_addr = None
         self.eeprom_addr = None
+        self.eeprom = None
+        self.eeprom_size = 256
+        self.eeprom_page = 8
+        self.fru_store = FruStore()
 
     def set_pmbus_addr(self, addr):
         self.pmbus_addr = addr
         self.device.addr = self.pmbus_addr
+        self.device.cache.invalidate_addr(addr)
+        self.energy.forget(addr)
+        self.supported = None
+        self.discovered = False
+        self.snapshot_reader = SnapshotReader(self.device, PARAM_CMDS)
+        # Новый блок опрашивается на базовой частоте, пока не применён его профиль
+        self.unit_freq = None
+        self.device.retries = 3
+        self.restore_bus_rates()
+
+    def restore_bus_rates(self):
+        """Шина 0 - на частоту текущего блока, остальные - на базовую."""
+        for bus_id, clock in self.bus_clocks.items():
+            clock.set(self.unit_freq if bus_id == 0 and self.unit_freq else clock.base)
+
+    def print_profile(self, profile):
+        for freq, (errors, reads) in sorted(profile["steps"].items(), key=lambda item: int(item[0])):
+            print(f"  {int(freq) // 1000:>5} kHz: {errors} errors / {reads} reads")
+        print(f"Bus profile: {profile['freq'] // 1000} kHz, {profile['retries']} read attempt(s), "
+              f"PEC {'on' if profile['pec'] else 'off'} during calibration")
+
+    def calibrate_command(self, force=False):
+        clock = self.bus_clocks[0]
+        profile, key, calibrated = resolve_profile(self.device, clock, self.bus_profiles, force)
+        if profile is None:
+            print("[ERROR] Unit does not answer at the base bus rate")
+            return
+        source = "calibrated" if calibrated else "loaded from " + self.bus_profiles.path
+        print(f"{key or 'unknown model'}: {source}")
+        self.print_profile(profile)
+        self.unit_freq = profile["freq"]
+        self.device.retries = profile["retries"]
+        clock.set(self.unit_freq)
+
+    def apply_fleet_profile(self, target):
+        """Профиль модели для цели группового опроса (калибровка - только для новой модели)."""
+        clock = self.fleet.bus_clocks.get(target.bus_id)
+        if clock is None:
+            return None
+        profile, key, calibrated = resolve_profile(target.device, clock, self.bus_profiles)
+        if profile is not None:
+            self.fleet.set_freq(target, profile["freq"])
+            target.device.retries = profile["retries"]
+        return profile
+
+    def ensure_capabilities(self, force=False):
+        if self.discovered and not force:
+            return
+        self.discovered = True
+        supported, key, probed, failed = self.capabilities.resolve(self.device, force)
+        if supported is None:
+            print("[!] QUERY not supported, polling all parameters")
+            return
+        self.supported = supported
+        cmds = [cmd for cmd in PARAM_CMDS if cmd.code in supported]
+        self.snapshot_reader = SnapshotReader(self.device, cmds)
+        source = "probed with QUERY" if probed else "loaded from " + self.capabilities.path
+        print(f"Capabilities of {key or 'unknown model'}: {len(supported)} commands {source}")
+        if failed:
+            print(f"[!] No QUERY answer for {len(failed)} commands after retries, "
+                  f"polling them anyway; result not stored (run 'discover' again)")
 
     def set_eeprom_addr(self, addr):
         self.eeprom_addr = addr
+        self.eeprom = Eeprom(self.device.i2c, addr, self.eeprom_size, self.eeprom_page)
 
-    def read_and_print(self, cmd: PMBusCommand):
-        if cmd.type == "Read Byte" or cmd.size == 1:
-            data = self.device.read_bytes(cmd.code, 1)
-            value = data[0] if data else None
-        elif cmd.type == "Read Word" or cmd.size == 2:
-            data = self.device.read_bytes(cmd.code, 2)
-            if data:
-                if cmd.name.startswith("STATUS_") or cmd.name in ["STATUS_WORD"]:
-                    value = (data[1] << 8) | data[0]
+    def print_hex(self, offset, data):
+        for i in range(0, len(data), 16):
+            row = data[i:i + 16]
+            text = "".join(chr(b) if 0x20 <= b < 0x7F else "." for b in row)
+            print(f"{offset + i:04X}: {' '.join(f'{b:02X}' for b in row):<47}  {text}")
+
+    def print_fru(self, fru):
+        for kind in ("chassis", "board", "product"):
+            area = fru.get(kind)
+            if area is None:
+                continue
+            if "error" in area:
+                print(f"{kind} area @0x{area['offset']:03X}: [{area['error']}]")
+                continue
+            bad = "" if area["checksum_ok"] else " [BAD CHECKSUM]"
+            print(f"{kind} area @0x{area['offset']:03X}, {area['length']} B{bad}")
+            for key, value in area.items():
+                if key not in ("offset", "length", "checksum_ok") and value != []:
+                    print(f"  {key:<14}: {value}")
+        for record in fru.get("multirecord", ()):
+            bad = "" if record["checksum_ok"] else " [BAD CHECKSUM]"
+            print(f"record 0x{record['type']:02X} {record['name']}, {len(record['data'])} B{bad}")
+            for key, value in record.items():
+                if key not in ("type", "name", "checksum_ok", "data"):
+                    print(f"  {key:<14}: {value}")
+
+    def eeprom_command(self, args):
+        """
+        eeprom size <bytes> [page] | dump [force] | fru [force] | read <hex> <len> | write <hex> <val...>
+        """
+        if len(args) in (2, 3) and args[0] == "size":
+            self.eeprom_size = int(args[1])
+            self.eeprom_page = int(args[2]) if len(args) == 3 else (8 if self.eeprom_size <= 256 else 16)
+            if self.eeprom_addr is not None:
+                self.set_eeprom_addr(self.eeprom_addr)
+            print(f"EEPROM: {self.eeprom_size} B, {self.eeprom_page} B pages")
+            return
+        if self.eeprom is None:
+            print("[!] EEPROM address not set. Use 'addr eeprom <hex>' to set it.")
+            return
+        eeprom = self.eeprom
+        try:
+            if args and args[0] in ("dump", "fru"):
+                image, cached = self.fru_store.load(eeprom, "force" in args)
+                if image is None:
+                    return
+                print(f"EEPROM 0x{eeprom.addr:02X}: {len(image)} B " + ("from cache" if cached else "read"))
+                if args[0] == "dump":
+                    self.print_hex(0, image)
+                    return
+                fru = parse_fru(image)
+                if fru is None:
+                    print("[!] No valid IPMI FRU common header")
                 else:
-                    if cmd in [READ_VOUT,
-                               VOUT_OV_FAULT_LIMIT,
-                               VOUT_UV_FAULT_LIMIT,
-                               MFR_VOUT_MIN,
-                               MFR_VOUT_MAX,
-                               READ_VSB_OUT]:
-                        exp_data = self.device.read_bytes(VOUT_MODE.code, 1)
-                        exponent_raw = int.from_bytes(exp_data, 'little')
-                        exponent = exponent_raw & 0x1F
-                        if exponent > 15:
-                            exponent -= 32
-                        lsb = data[0]
-                        msb = data[1]
-                        value = linear16_to_float( lsb | (msb << 8) , exponent)
-                    else:       
-                        value = decode_linear_format(data[0], data[1])
-            else:
-                value = None
-        elif cmd.type == "Block Read":
-            data = self.device.block_read(cmd.code, cmd.size)
-            value = data if data else None
-        else:
-            value = None
-
-        if value is None:
-            print(f"{cmd.name:<25}: [ERROR]")
-        elif isinstance(value, (int, float)):
-            print(f"{cmd.name:<25}: {value:.2f}" if not cmd.name.startswith("STATUS_") else f"{cmd.name:<25}: 0x{value:04X}")
-        elif isinstance(value, (bytes, bytearray, list)):
-            if cmd.name.startswith("MFR_") or "ID" in cmd.name or "REVISION" in cmd.name:
-                try:
-                    text = bytes(value).decode("ascii", errors="ignore").strip()
-                    print(f"{cmd.name:<25}: {text[:60]}" + ("..." if len(text) > 60 else ""))
-                except:
-                    print(f"{cmd.name:<25}: {[hex(b) for b in value]}")
+                    self.print_fru(fru)
+            elif len(args) == 3 and args[0] == "read":
+                offset = int(args[1], 16)
+                data = eeprom.read(offset, int(args[2]))
+                if data is not None:
+                    self.print_hex(offset, data)
+            elif len(args) >= 3 and args[0] == "write":
+                offset = int(args[1], 16)
+                values = bytes(int(v, 16) for v in args[2:])
+                # Подпись может не измениться при записи без исправления контрольных сумм
+                self.fru_store.forget((0, eeprom.addr))
+                if eeprom.write(offset, values):
+                    print(f"Write complete ({len(values)} B, {eeprom.polls} ACK polls)")
             else:
-                hex_str = " ".join(hex(b) for b in value)
-                print(f"{cmd.name:<25}: {hex_str[:60]}" + ("..." if len(hex_str) > 60 else ""))
+                print("Usage: eeprom size <bytes> [page] | dump [force] | fru [force] | "
+                      "read <hex> <len> | write <hex> <val...>")
+        except ValueError as e:
+            print("[!]", e)
+
+    def read_and_print(self, cmd: PMBusCommand):
+        data = self.device.read_command(cmd)
+        exponent = None
+        if cmd.decoder == DEC_LINEAR16:
+            mode = self.device.read_cached(VOUT_MODE.code, 1)
+            exponent = vout_exponent(mode[0]) if mode else None
+        print(format_value(cmd, decode_value(cmd, data, exponent)))
+
+    def page_read_and_print(self, page, name):
+        cmd = find_command(name)
+        if cmd is None:
+            try:
+                cmd = command_by_code(int(name, 16))
+            except ValueError:
+                cmd = None
+        if cmd is None:
+            print(f"[!] Unknown command {name}")
+            return
+        data = self.device.page_plus_read(page, cmd.code)
+        exponent = None
+        if data and cmd.decoder == DEC_LINEAR16:
+            mode = self.device.buffer(1)
+            if self.device.read_command_into(VOUT_MODE, mode, page):
+                exponent = vout_exponent(mode[0])
+        print(f"PAGE {page} " + format_value(cmd, decode_value(cmd, data, exponent)))
+
+    def poll_pages(self, args):
+        """
+        pages <p1> [p2 ...] [switch] - параметры каналов многоканального блока.
+        По умолчанию PAGE_PLUS_READ, switch - одна запись PAGE на страницу и обычные чтения.
+        """
+        page_plus = "switch" not in args
+        try:
+            pages = [int(v, 16) for v in args if v != "switch"]
+        except ValueError:
+            pages = None
+        if not pages or not 0 <= min(pages) <= max(pages) <= 0xFF:
+            print("Usage: pages <page1> [page2 ...] [switch]")
+            return
+        reader = PagedReader(self.device, pages, PAGE_CMDS, page_plus)
+        for snap in reader.capture():
+            print(f"--- PAGE {snap.page} ({snap.errors} errors, skew {snap.skew_us} us) ---")
+            for cmd, value in zip(snap.cmds, snap.values):
+                print("  " + format_value(cmd, value))
+
+    def run_named(self, cmd: PMBusCommand):
+        if cmd.type == "Send Byte":
+            print(f"{cmd.name}: " + ("sent" if self.device.send_byte(cmd.code) else "[ERROR]"))
         else:
-            print(f"{cmd.name:<25}: {value}")
+            self.read_and_print(cmd)
 
-    def decode_status(self, name, data, bit_defs):
-        byte = data[0] if len(data) == 1 else (data[1] << 8 | data[0])
+    def decode_status(self, name, data, bits):
+        if not data:
+            print(f"Decoded {name}: [ERROR]")
+            return
+        value = register_value(data)
         print(f"Decoded {name}:")
-        for bit, label in bit_defs.items():
-            active = (byte >> bit) & 1
-            print(f"  [{bit}] {label:<30}: {'YES' if active else 'NO'}")
+        for mask, bit, label in bits:
+            print(f"  [{bit}] {label:<30}: {'YES' if value & mask else 'NO'}")
 
     def decode_all_statuses(self):
-        self.decode_status("STATUS_WORD", self.device.read_bytes(STATUS_WORD.code, STATUS_WORD.size), {
-            15: "VOUT", 14: "IOUT/POUT", 13: "INPUT", 12: "MFR", 11: "POWER_GOOD#",
-            10: "FANS", 9: "OTHER", 8: "UNKNOWN",
-            7: "BUSY", 6: "OFF", 5: "VOUT_OV", 4: "IOUT_OC", 3: "VIN_UV",
-            2: "TEMPERATURE", 1: "CML", 0: "NONE OF THE ABOVE"
-        })
-        self.decode_status("STATUS_VOUT", self.device.read_bytes(STATUS_VOUT.code, STATUS_VOUT.size), {
-            7: "VOUT Over voltage Fault", 6: "VOUT Over voltage Warning",
-            5: "VOUT Under voltage Warning", 4: "VOUT Under voltage Fault",
-            3: "VOUT_MAX Warning", 2: "TON_MAX_FAULT", 1: "TOFF_MAX Warning", 0: "VOUT Tracking Error"
-        })
-        self.decode_status("STATUS_IOUT", self.device.read_bytes(STATUS_IOUT.code, STATUS_IOUT.size), {
-            7: "IOUT Over current Fault", 6: "IOUT OC + LV Shutdown Fault",
-            5: "IOUT Over current Warning", 4: "IOUT Undercurrent Fault",
-            3: "Current Share Fault", 2: "Power Limiting",
-            1: "POUT Overpower Fault", 0: "POUT Overpower Warning"
-        })
-        self.decode_status("STATUS_INPUT", self.device.read_bytes(STATUS_INPUT.code, STATUS_INPUT.size), {
-            7: "VIN Over voltage Fault", 6: "VIN Over voltage Warning",
-            5: "VIN Under voltage Warning", 4: "VIN Under voltage Fault",
-            3: "Unit Off - Low Input", 2: "IIN Over current Fault",
-            1: "IIN Over current Warning", 0: "PIN Overpower Warning"
-        })
-        self.decode_status("STATUS_TEMPERATURE", self.device.read_bytes(STATUS_TEMPERATURE.code, STATUS_TEMPERATURE.size), {
-            7: "Over temperature Fault", 6: "Over temperature Warning",
-            5: "Under temperature Warning", 4: "Under temperature Fault"
-        })
-        self.decode_status("STATUS_FANS_1_2", self.device.read_bytes(STATUS_FANS_1_2.code, STATUS_FANS_1_2.size), {
-            7: "Fan 1 Fault", 6: "Fan 2 Fault", 5: "Fan 1 Warning", 4: "Fan 2 Warning",
-            3: "Fan 1 Speed Overridden", 2: "Fan 2 Speed Overridden",
-            1: "Airflow Fault", 0: "Airflow Warning"
-        })
-        self.decode_status("STATUS_OTHER", self.device.read_bytes(STATUS_OTHER.code, STATUS_OTHER.size), {
-            5: "Input A Fuse Fault", 4: "Input B Fuse Fault",
-            3: "Input A OR-ing Fault", 2: "Input B OR-ing Fault",
-            1: "Output OR-ing Fault"
-        })
+        for cmd, bits in STATUS_REGISTERS:
+            buf = self.device.buffer(cmd.size)
+            self.decode_status(cmd.name, buf if self.device.read_into(cmd.code, buf) else None, bits)
+
+    def print_faults(self):
+        use_word = self.supported is None or STATUS_WORD.code in self.supported
+        faults = read_fault_tree(self.device, use_word)
+        if faults is None:
+            print("[ERROR] Status read failed")
+        elif not faults:
+            print("No faults")
+        else:
+            for name, bit, label in faults:
+                print(f"{name:<20} [{bit}] {label}")
 
     def poll_params(self):
-        cmds = [
-            VOUT_OV_FAULT_LIMIT, VOUT_UV_FAULT_LIMIT,
-            IOUT_OC_FAULT_LIMIT, IOUT_OC_WARN_LIMIT,
-            OT_FAULT_LIMIT, OT_WARN_LIMIT,
-            VIN_OV_FAULT_LIMIT, VIN_OV_WARN_LIMIT,
-            VIN_UV_WARN_LIMIT, VIN_UV_FAULT_LIMIT,
-            READ_VIN, READ_IIN, READ_VOUT, READ_IOUT,
-            READ_TEMPERATURE_1, READ_TEMPERATURE_2, READ_TEMPERATURE_3,
-            READ_FAN_SPEED_1, READ_POUT, READ_PIN,
-            VOUT_MODE, MFR_ID, MFR_MODEL, MFR_REVISION,
-            MFR_VIN_MIN, MFR_VIN_MAX, MFR_VOUT_MIN, MFR_VOUT_MAX, MFR_IOUT_MAX, READ_LSB, READ_VSB_OUT, READ_ISB_OUT, READ_FAN_DUTY,
-            READ_PSON, READ_CRB, READ_VINOK, READ_ALERT, READ_ADDR
-        ]
-        for cmd in cmds:
-            self.read_and_print(cmd)
+        cache = self.device.cache
+        self.ensure_capabilities()
+        hits, misses = cache.hits, cache.misses
+        snap = self.snapshot_reader.capture()
+        for cmd, value in zip(snap.cmds, snap.values):
+            print(format_value(cmd, value))
+        print(f"Snapshot skew: {snap.skew_us} us over {len(snap.cmds)} reads ({snap.errors} errors)")
+        reader = self.snapshot_reader
+        print(f"Heap allocated: bus phase {reader.heap_bus} B, whole cycle {reader.heap_total} B")
+        print(f"Metadata cache: {cache.hits - hits} hits, {cache.misses - misses} misses")
+
+    def print_cache_stats(self):
+        cache = self.device.cache
+        print(f"Metadata cache: {cache.hits} hits, {cache.misses} misses")
+        for addr, regs in cache.entries.items():
+            codes = " ".join(f"0x{key[0]:02X}/page {'?' if key[1] is None else key[1]}"
+                             if isinstance(key, tuple) else f"0x{key:02X}" for key in regs)
+            print(f"  0x{addr:02X}: {codes}")
             
+    def energy_command(self, args):
+        """
+        energy          - средние мощности с предыдущего вызова (первый вызов - окно 1 с)
+        energy <sec>    - средние мощности за окно заданной длительности
+        """
+        window_ms = 1000
+        if args:
+            try:
+                window_ms = int(float(args[0]) * 1000)
+            except (ValueError, OverflowError):
+                window_ms = 0
+            if len(args) > 1 or window_ms <= 0:
+                print("Usage: energy [sec]  (window length in seconds, > 0)")
+                return
+        first = self.energy.previous()
+        if args or first is None:
+            first = self.energy.sample()
+            sleep_ms(window_ms)
+        second = self.energy.sample()
+        if second.ein is None and second.eout is None:
+            print("[ERROR] READ_EIN/READ_EOUT read failed")
+            return
+        window = EnergyWindow(first, second)
+        coeffs_in, coeffs_out, from_unit = second.coeffs
+        print(f"Coefficients m, b, R: EIN {coeffs_in}, EOUT {coeffs_out} "
+              f"({'COEFFICIENTS' if from_unit else 'default, not reported by the unit'})")
+        print(f"Window: {window.ms} ms, {window.samples_in} input / {window.samples_out} output samples")
+        for name, value in (("PIN avg", window.pin), ("POUT avg", window.pout)):
+            print(f"{name:<25}: " + ("[N/A]" if value is None else f"{value:.2f} W"))
+        if window.efficiency is not None:
+            print(f"{'Efficiency':<25}: {window.efficiency * 100:.2f} %")
+
+    def monitor(self, args):
+        if len(args) < 2:
+            print("Usage: monitor <rate_hz> <cmd1> [cmd2 ...]")
+            return
+        try:
+            rate = int(args[0])
+        except ValueError:
+            print("Usage: monitor <rate_hz> <cmd1> [cmd2 ...]")
+            return
+        if not 1 <= rate <= 200:
+            print("[!] Rate must be 1..200 Hz")
+            return
+        cmds = []
+        for name in args[1:]:
+            cmd = find_command(name)
+            if cmd is None:
+                print(f"[!] Unknown command {name}")
+                return
+            cmds.append(cmd)
+        try:
+            mon = Monitor(self.device, cmds, rate, alert=self.alert)
+        except ValueError as e:
+            print("[!]", e)
+            return
+        print(f"Monitoring {len(cmds)} channels at {rate} Hz, press any key to stop")
+        mon.run()
+        print(f"\nSamples: {mon.samples}, dropped: {mon.dropped}, overrun: {mon.ring.overrun}")
+
+    def log_units(self):
+        """Блоки сеанса журнала: цели группового опроса или текущий блок."""
+        units = [(target.bus_id, target.device, target.freq) for target in self.fleet.all_targets()]
+        if not units and self.pmbus_addr is not None:
+            units.append((0, self.device, self.unit_freq))
+        return units
+
+    def parse_log_cmds(self, names):
+        if not names:
+            return list(LOG_CMDS)
+        cmds = []
+        for name in names:
+            cmd = find_command(name)
+            if cmd is None:
+                print(f"[!] Unknown command {name}")
+                return None
+            cmds.append(cmd)
+        return cmds
+
+    def start_log(self, period_ms, cmds):
+        units = self.log_units()
+        if not units:
+            print("[!] Nothing to log: set 'addr pmbus <hex>' or add fleet targets")
+            return
+        try:
+            logger = FlashLogger(cmds, period_ms=period_ms)
+        except (ValueError, OSError) as e:
+            print("[!]", e)
+            return
+        print(f"Logging {len(units)} unit(s), {len(cmds)} channels every {period_ms} ms "
+              f"to {logger.path}, press any key to stop")
+        try:
+            full = logger.run(units, period_ms, self.bus_clocks, self.service_alerts)
+        finally:
+            self.restore_bus_rates()
+        if full:
+            print("[!] Log space exhausted")
+        print(f"Records: {logger.records} x {logger.record_size} B, {logger.sectors} sector writes, "
+              f"longest write {logger.max_stall_us} us")
+
+    def log_command(self, args):
+        if args and args[0] == "list":
+            for name in log_files():
+                print(f"  {name}  {os.stat(name)[6]} B")
+            free = free_bytes()
+            if free is not None:
+                print(f"Free flash: {free} B")
+        elif args and args[0] == "clear":
+            for name in log_files():
+                os.remove(name)
+            print("Log files removed")
+        elif args[:2] == ["boot", "off"]:
+            try:
+                os.remove(AUTOLOG_PATH)
+            except OSError:
+                pass
+            print("Boot logging disabled")
+        elif len(args) >= 2 and args[0] == "boot" and args[1].isdigit():
+            cmds = self.parse_log_cmds(args[2:])
+            if cmds is None:
+                return
+            if not self.log_units():
+                print("[!] Nothing to log: set 'addr pmbus <hex>' or add fleet targets")
+                return
+            config = {"addr": self.pmbus_addr, "period_ms": int(args[1]),
+                      "cmds": [cmd.name for cmd in cmds],
+                      "fleet": [[t.bus_id, t.addr, t.period_ms] for t in self.fleet.all_targets()]}
+            with open(AUTOLOG_PATH, "w") as f:
+                json.dump(config, f)
+            print(f"Logging will start on power-up ({AUTOLOG_PATH})")
+        elif args and args[0].isdigit():
+            cmds = self.parse_log_cmds(args[1:])
+            if cmds is not None:
+                self.start_log(int(args[0]), cmds)
+        else:
+            print("Usage: log <ms> [cmd ...] | boot <ms> [cmd ...] | boot off | list | clear")
+
+    def autolog(self):
+        """Сеанс журнала при включении по autolog.json (стенд прогона без хоста)."""
+        try:
+            with open(AUTOLOG_PATH) as f:
+                config = json.load(f)
+        except (OSError, ValueError):
+            return
+        if config.get("addr") is not None:
+            self.set_pmbus_addr(config["addr"])
+            self.calibrate_command()
+        for bus_id, addr, period in config.get("fleet", ()):
+            try:
+                self.apply_fleet_profile(self.fleet.add(bus_id, addr, period))
+            except ValueError as e:
+                print("[!]", e)
+        self.restore_bus_rates()
+        cmds = self.parse_log_cmds(config.get("cmds"))
+        if cmds is not None:
+            self.start_log(config["period_ms"], cmds)
+
+    def fleet_command(self, args):
+        if not args:
+            print("Usage: fleet add <bus> <hex> [period_ms] | del <bus> <hex> | list | clear | poll [cycles] [par]")
+            return
+        try:
+            if args[0] == "add" and len(args) in (3, 4):
+                period = int(args[3]) if len(args) == 4 else 0
+                target = self.fleet.add(int(args[1]), int(args[2], 16), period)
+                profile = self.apply_fleet_profile(target)
+                self.restore_bus_rates()
+                rate = f"{profile['freq'] // 1000} kHz" if profile else "base rate"
+                print(f"Added I2C{args[1]} 0x{int(args[2], 16):02X} every {period} ms at {rate}")
+            elif args[0] == "del" and len(args) == 3:
+                self.fleet.remove(int(args[1]), int(args[2], 16))
+            elif args[0] == "list":
+                for target in self.fleet.all_targets():
+                    rate = f"{target.freq // 1000} kHz" if target.freq else "base rate"
+                    print(f"  I2C{target.bus_id} 0x{target.addr:02X} every {target.period_ms} ms at {rate}")
+            elif args[0] == "clear":
+                self.fleet.clear()
+            elif args[0] == "poll":
+                cycles = int(args[1]) if len(args) > 1 and args[1] != "par" else 1
+                if "par" in args:
+                    self.fleet.start_worker()
+                try:
+                    for _ in range(cycles):
+                        self.print_fleet_snapshot(self.fleet.cycle())
+                        self.service_alerts()
+                except OSError as e:
+                    print(f"[ERROR] Fleet poll stopped: {e}")
+                finally:
+                    self.fleet.stop_worker()
+                    self.restore_bus_rates()
+            else:
+                print("Unknown fleet command")
+        except ValueError as e:
+            print("[!]", e)  # неверный номер шины, адрес, период или число циклов
+
+    def print_fleet_snapshot(self, fleet_snap):
+        print(f"--- t={fleet_snap.t_ms} ms, {len(fleet_snap.results)} targets ---")
+        for (bus_id, addr), snap in sorted(fleet_snap.results.items()):
+            print(f"I2C{bus_id} 0x{addr:02X} (skew {snap.skew_us} us):")
+            for cmd, value in zip(snap.cmds, snap.values):
+                print("  " + format_value(cmd, value))
+
+    def stat_devices(self):
+        """Все PMBusDevice тестера с шиной: текущий блок, цели группового опроса, блоки SMBALERT#."""
+        devices = [(0, self.device)]
+        devices += [(target.bus_id, target.device) for target in self.fleet.all_targets()]
+        if self.alert is not None:
+            devices += [(0, dev) for dev in self.alert.devices.values()]
+        return devices
+
+    def stats_by_unit(self):
+        """{(bus_id, addr): BusStats}; счётчики одного блока из разных устройств суммируются."""
+        groups = {}
+        for bus_id, device in self.stat_devices():
+            for addr, stats in device.unit_stats.items():
+                if addr is not None:
+                    groups.setdefault((bus_id, addr), []).append(stats)
+        units = {}
+        for key, parts in groups.items():
+            if len(parts) == 1:
+                units[key] = parts[0]
+                continue
+            units[key] = BusStats()
+            for part in parts:
+                units[key].merge(part)
+        return {key: stats for key, stats in units.items() if any(stats.count)}
+
+    def reset_stats(self):
+        for bus_id, device in self.stat_devices():
+            for stats in device.unit_stats.values():
+                stats.reset()
+
+    def print_stats(self):
+        units = self.stats_by_unit()
+        if not units:
+            print("No transactions recorded")
+        for (bus_id, addr), stats in sorted(units.items()):
+            print(f"I2C{bus_id} 0x{addr:02X}:")
+            print(f"  {'CMD':<22}{'count':>7}{'err':>6}{'retry':>6}{'nack':>6}{'pec':>5}"
+                  f"{'min':>7}{'avg':>7}{'max':>7}  (us)")
+            for code, row in stats.rows():
+                cmd = command_by_code(code)
+                name = cmd.name if cmd else f"0x{code:02X}"
+                count, errors, retries, nacks, pec, lat_min, lat_avg, lat_max = row
+                print(f"  {name:<22}{count:>7}{errors:>6}{retries:>6}{nacks:>6}{pec:>5}"
+                      f"{lat_min:>7}{lat_avg:>7}{lat_max:>7}")
+
+    def dump_stats(self):
+        units = [{"bus": bus_id, "addr": addr, "codes": stats.dump()}
+                 for (bus_id, addr), stats in sorted(self.stats_by_unit().items())]
+        print(json.dumps({"fields": DUMP_FIELDS, "units": units}))
+
+    def alert_command(self, args):
+        if args and args[0] == "off":
+            if self.alert is not None:
+                self.alert.close()
+                self.alert = None
+            print("SMBALERT# disabled")
+        elif len(args) == 1 and args[0].isdigit():
+            if self.alert is not None:
+                self.alert.close()
+            self.alert = AlertHandler.on_gpio(self.device.i2c, int(args[0]))
+            self.alert.configure(self.device.pec, self.device.retries)
+            print(f"SMBALERT# enabled on GPIO {args[0]}")
+        else:
+            print("Usage: alert <gpio> | alert off")
+
+    def service_alerts(self, announce=True):
+        """
+        Обслуживание SMBALERT# из основного цикла и долгих циклов (fleet poll, log, binary).
+        announce=False - без вывода текста (бинарный режим: текст сломал бы поток кадров).
+        """
+        if self.alert is None:
+            return
+        self.alert.configure(self.device.pec, self.device.retries)
+        if self.alert.active():
+            # Ответ ARA и статусы читаются на базовой частоте, затем шины возвращаются к своим
+            clock = self.bus_clocks.get(0)
+            if clock is not None:
+                clock.set(clock.base)
+            try:
+                self.alert.service()
+            finally:
+                self.restore_bus_rates()
+        # События могли быть собраны и раньше (Monitor.poll вызывает service() сам)
+        events = self.alert.take()
+        if not events:
+            return
+        self.alert_log.extend(events)
+        del self.alert_log[:-ALERT_LOG_SIZE]
+        if announce:
+            print(f"[ALERT] {len(events)} new event(s), type 'events' to show")
+
+    def print_events(self):
+        if not self.alert_log:
+            print("No alert events")
+        for event in self.alert_log:
+            if event.faults is None:
+                print(f"t={event.t_ms} ms 0x{event.addr:02X}: [status read error]")
+                continue
+            print(f"t={event.t_ms} ms 0x{event.addr:02X}: {len(event.faults)} active")
+            for name, bit, label in event.faults:
+                print(f"    {name:<20} [{bit}] {label}")
+        if self.alert is not None and self.alert.lost:
+            print(f"Lost events (queue overflow): {self.alert.lost}")
+
+    def binary_mode(self):
+        """Бинарный протокол поверх USB CDC до запроса OP_EXIT."""
+        try:
+            import micropython
+        except ImportError:
+            micropython = None
+        print("Entering binary mode")
+        if micropython:
+            micropython.kbd_intr(-1)  # байт 0x03 в кадре не должен вызывать KeyboardInterrupt
+        try:
+            ProtocolServer(self, sys.stdin.buffer, sys.stdout.buffer).serve()
+        finally:
+            if micropython:
+                micropython.kbd_intr(3)
+        print("Binary mode finished")
+
     def scan_bus(self):
         print("Scanning I2C bus...")
         found = self.device.i2c.scan()
@@ -146,28 +623,20 @@ class PMBusManager:
         return True
 
     def run(self):
-        all_cmds = {cmd.name.lower(): cmd for cmd in [
-            VOUT_OV_FAULT_LIMIT, VOUT_UV_FAULT_LIMIT,
-            IOUT_OC_FAULT_LIMIT, IOUT_OC_WARN_LIMIT,
-            OT_FAULT_LIMIT, OT_WARN_LIMIT,
-            VIN_OV_FAULT_LIMIT, VIN_OV_WARN_LIMIT,
-            VIN_UV_WARN_LIMIT, VIN_UV_FAULT_LIMIT,
-            READ_VIN, READ_IIN, READ_VOUT, READ_IOUT,
-            READ_TEMPERATURE_1, READ_TEMPERATURE_2, READ_TEMPERATURE_3,
-            READ_FAN_SPEED_1, READ_POUT, READ_PIN,
-            VOUT_MODE, MFR_ID, MFR_MODEL, MFR_REVISION,
-            MFR_VIN_MIN, MFR_VIN_MAX, MFR_VOUT_MIN, MFR_VOUT_MAX, MFR_IOUT_MAX
-        ]}
-
         print("PMBus console. Type 'help' for available commands.")
 
         while True:
+            self.service_alerts()
             cmd = input("\n> ").strip().lower()
+            self.service_alerts()
 
             needs_pmbus = (
-                cmd in ["params", "status"] or
+                cmd in ["params", "status", "faults", "calibrate", "calibrate force"] or
                 cmd.startswith("read ") or cmd.startswith("write ") or
-                cmd in all_cmds
+                cmd.startswith("monitor ") or cmd.startswith("pages ") or
+                cmd.startswith("read_page_plus ") or cmd.startswith("write_page_plus ") or
+                cmd == "energy" or cmd.startswith("energy ") or
+                cmd in BY_NAME
             )
             if needs_pmbus and not self.is_pmbus_set():
                 continue
@@ -176,8 +645,49 @@ class PMBusManager:
                 self.poll_params()
             elif cmd == "status":
                 self.decode_all_statuses()
+            elif cmd == "faults":
+                self.print_faults()
             elif cmd == "scan":
                 self.scan_bus()
+            elif cmd == "fleet" or cmd.startswith("fleet "):
+                self.fleet_command(cmd.split()[1:])
+            elif cmd == "energy" or cmd.startswith("energy "):
+                self.energy_command(cmd.split()[1:])
+            elif cmd in ("calibrate", "calibrate force"):
+                self.calibrate_command(cmd == "calibrate force")
+            elif cmd.startswith("eeprom"):
+                self.eeprom_command(cmd.split()[1:])
+            elif cmd.startswith("pages "):
+                self.poll_pages(cmd.split()[1:])
+            elif cmd == "log" or cmd.startswith("log "):
+                self.log_command(cmd.split()[1:])
+            elif cmd.startswith("monitor "):
+                self.monitor(cmd.split()[1:])
+            elif cmd == "alert" or cmd.startswith("alert "):
+                self.alert_command(cmd.split()[1:])
+            elif cmd == "events":
+                self.print_events()
+            elif cmd == "events clear":
+                self.alert_log = []
+                print("Alert events cleared")
+            elif cmd in ("pec on", "pec off"):
+                self.device.pec = cmd == "pec on"
+                print(f"PEC on every transaction: {'ON' if self.device.pec else 'OFF'}")
+            elif cmd == "binary":
+                self.binary_mode()
+            elif cmd == "stats":
+                self.print_stats()
+            elif cmd == "stats reset":
+                self.reset_stats()
+                print("Statistics reset")
+            elif cmd == "stats dump":
+                self.dump_stats()
+            elif cmd == "cache":
+                self.print_cache_stats()
+            elif cmd == "cache clear":
+                self.device.cache.clear()
+                self.device.cache.reset_counters()
+                print("Metadata cache cleared")
             elif cmd == "exit":
                 print("Exiting.")
                 break
@@ -213,19 +723,44 @@ class PMBusManager:
                 print("Available commands:")
                 print("  params             - show all monitored parameters")
                 print("  status             - show all decoded status registers")
-                print("  <PARAM_NAME>       - show value of one known command (e.g. MFR_VIN_MIN)")
+                print("  faults             - show only active faults (reads STATUS_WORD, then flagged registers)")
+                print("  <PARAM_NAME>       - show value of any command in commands.py (e.g. MFR_VIN_MIN, STATUS_WORD);")
+                print("                       Send Byte commands (CLEAR_FAULTS) are sent")
                 print("  addr pmbus <hex>   - set PMBus address")
                 print("  addr eeprom <hex>  - set EEPROM address")
+                print("  eeprom size <bytes> [page]  - EEPROM geometry (default 256 B, 8 B pages)")
+                print("  eeprom dump|fru [force]     - read EEPROM image (cached per unit) as hex or IPMI FRU areas")
+                print("  eeprom read <hex> <len>     - sequential read")
+                print("  eeprom write <hex> <val...> - page-aligned write with ACK polling")
                 print("  showaddr           - show current addresses")
                 print("  read <reg> <len>   - read <len> bytes from <reg> (hex)")
                 print("  write <reg> <val1> [val2 ...] - write bytes to register")
                 print("  scan               - scan and list devices on I2C bus")
+                print("  energy [sec]              - average PIN/POUT and efficiency from READ_EIN/READ_EOUT accumulators")
+                print("  monitor <hz> <cmd...>     - stream binary samples of commands until a key is pressed")
+                print("  log <ms> [cmd...]         - append binary telemetry records to flash until a key is pressed")
+                print("  log boot <ms> [cmd...] | boot off - start logging on power-up (also log list/clear)")
+                print("  fleet add <bus> <hex> [ms] - add PSU to multi-unit polling (also del/list/clear)")
+                print("  calibrate [force]         - find the highest stable bus rate for the unit, store it per model")
+                print("  fleet poll [n] [par]      - poll all fleet targets n cycles (par: I2C1 on core 1)")
+                print("  alert <gpio> | off        - capture faults on SMBALERT# via Alert Response Address")
+                print("                              (serviced at the prompt and between monitor/fleet/log cycles"
+                      " and binary frames)")
+                print("  events [clear]            - show or clear captured alert events")
+                print("  binary                    - switch to framed binary protocol for the host client")
+                print("  stats [reset|dump]        - per-unit, per-command transaction counters, latency, retries, NACK, PEC")
+                print("  cache [clear]      - show or clear metadata cache (VOUT_MODE, MFR_*)")
                 print("  check <cmd>         - check if a command code is supported by device")
+                print("  discover           - re-run QUERY discovery for all commands and store it per model")
                 print("  readpec <reg> <len>       - read with PEC")
+                print("  pec on|off                - use PEC on every transaction (reads, block reads, writes)")
                 print("  writepec <reg> <val1>...  - write with PEC")
+                print("  pages <p...> [switch]     - per-rail parameters via PAGE_PLUS_READ (switch: PAGE write per page)")
+                print("  read_page_plus <page> <cmd>      - PAGE_PLUS_READ of one command (name or hex code)")
+                print("  write_page_plus <page> <reg> <val...> - PAGE_PLUS_WRITE")
                 print("  exit               - exit the console")
-            elif cmd in all_cmds:
-                self.read_and_print(all_cmds[cmd])
+            elif cmd in BY_NAME:
+                self.run_named(BY_NAME[cmd])
             elif cmd.startswith("check "):
                 if not self.is_pmbus_set():
                     continue
@@ -233,14 +768,23 @@ class PMBusManager:
                 if len(parts) == 2:
                     try:
                         code = int(parts[1], 16)
-                        self.device.i2c.writeto(self.pmbus_addr, bytes([0x1A, code]))
-                        result = self.device.i2c.readfrom(self.pmbus_addr, 1)
-                        if result and result[0] == 1:
-                            print(f"Command 0x{code:02X} is supported.")
-                        else:
-                            print(f"Command 0x{code:02X} is NOT supported.")
-                    except Exception as e:
-                        print("QUERY failed:", e)
+                    except ValueError as e:
+                        print("Bad command code:", e)
+                        continue
+                    result = self.device.query(code)
+                    if result is None:
+                        print("QUERY failed")
+                    elif result & 0x80:
+                        print(f"Command 0x{code:02X} is supported (QUERY 0x{result:02X}).")
+                    else:
+                        print(f"Command 0x{code:02X} is NOT supported.")
+            elif cmd == "discover":
+                if not self.is_pmbus_set():
+                    continue
+                self.ensure_capabilities(force=True)
+                if self.supported is not None:
+                    names = [c.name for c in all_commands() if c.code in self.supported]
+                    print("Supported: " + " ".join(names))
             elif cmd.startswith("readpec "):
                 parts = cmd.split()
                 if len(parts) == 3:
@@ -257,12 +801,25 @@ class PMBusManager:
                     print("Write complete" if success else "[ERROR] Write failed")
             elif cmd.startswith("read_page_plus "):
                 parts = cmd.split()
-                print(parts)
-                values = [int(v, 16) for v in parts[1:]]
-                byte_count, page, command = values
-                response = self.device.page_plus_read(byte_count, page, command)
-                print(f"PAGE_PLUS_READ Response {response}")
-                
+                if len(parts) == 3:
+                    try:
+                        page = int(parts[1], 16)
+                    except ValueError:
+                        page = -1
+                    if not 0 <= page <= 0xFF:
+                        print("Usage: read_page_plus <page> <cmd>")
+                        continue
+                    self.page_read_and_print(page, parts[2])
+            elif cmd.startswith("write_page_plus "):
+                parts = cmd.split()
+                if len(parts) >= 4:
+                    try:
+                        values = [int(v, 16) for v in parts[1:]]
+                        success = self.device.page_plus_write(values[0], values[1], values[2:])
+                    except ValueError as e:
+                        print("[!]", e)  # не hex, блок длиннее 253 байт или значение больше 0xFF
+                        continue
+                    print("Write complete" if success else "[ERROR] Write failed")
             else:
                 print("Unknown command. Type 'help' for list of commands.")
                 
\ No newline at end of file
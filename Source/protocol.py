@@ -0,0 +1,149 @@
+import struct
+from commands import BY_CODE, PARAM_CMDS
+from snapshot import SnapshotReader
+from pmbus import PMBusDevice
+from compat import ticks_diff
+
+# Кадр запроса:  SYNC(2) | LEN(u16) | SEQ(1) | OP(1)     | PAYLOAD(LEN)
+# Кадр ответа:   SYNC(2) | LEN(u16) | SEQ(1) | STATUS(1) | PAYLOAD(LEN)
+# Все числа little-endian. SEQ ответа равен SEQ запроса, поэтому хост может
+# отправлять запросы, не дожидаясь ответов на предыдущие.
+SYNC = b"\x5A\xA5"
+HEADER = "<HBB"
+MAX_PAYLOAD = 1024
+
+OP_PING = 0x01          # -> "PMBT"
+OP_RAW_READ = 0x02      # addr, code, length -> данные
+OP_PEC_READ = 0x03      # addr, code, length -> данные (PEC проверен)
+OP_READ_CMD = 0x04      # addr, code -> данные команды из реестра (размер и тип по commands.py)
+OP_SNAPSHOT = 0x05      # addr -> skew_us(u32), count(u8), {code, len, данные} * count
+OP_EXIT = 0x0F          # вернуться в текстовый CLI
+
+ST_OK = 0
+ST_ERROR = 1            # ошибка на шине / PEC
+ST_BAD_REQUEST = 2      # неизвестная операция, команда или неверная длина
+
+
+def encode_frame(seq, code, payload=b""):
+    return SYNC + struct.pack(HEADER, len(payload), seq, code) + payload
+
+
+class ProtocolServer:
+    """Бинарный режим: обработка кадров-запросов из потока до OP_EXIT или конца потока."""
+
+    def __init__(self, manager, stream_in, stream_out):
+        self.manager = manager
+        self.stream_in = stream_in
+        self.stream_out = stream_out
+        self.devices = {}
+        self.readers = {}
+
+    def device(self, addr):
+        if addr == self.manager.pmbus_addr:
+            return self.manager.device
+        dev = self.devices.get(addr)
+        if dev is None:
+            dev = PMBusDevice(self.manager.device.i2c)
+            dev.addr = addr
+            self.devices[addr] = dev
+        return dev
+
+    def reader(self, addr):
+        if addr == self.manager.pmbus_addr:
+            return self.manager.snapshot_reader
+        reader = self.readers.get(addr)
+        if reader is None:
+            reader = self.readers[addr] = SnapshotReader(self.device(addr), PARAM_CMDS)
+        return reader
+
+    def read_exact(self, n):
+        data = b""
+        while len(data) < n:
+            chunk = self.stream_in.read(n - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def read_frame(self):
+        # Поиск синхрослова, лишние байты (например, эхо терминала) пропускаются
+        prev = 0
+        while True:
+            byte = self.read_exact(1)
+            if byte is None:
+                return None
+            if prev == SYNC[0] and byte[0] == SYNC[1]:
+                break
+            prev = byte[0]
+        header = self.read_exact(4)
+        if header is None:
+            return None
+        length, seq, op = struct.unpack(HEADER, header)
+        if length > MAX_PAYLOAD:
+            return seq, op, None
+        payload = self.read_exact(length) if length else b""
+        if payload is None:
+            return None
+        return seq, op, payload
+
+    def reply(self, seq, status, payload=b""):
+        self.stream_out.write(encode_frame(seq, status, payload))
+        if hasattr(self.stream_out, "flush"):
+            self.stream_out.flush()
+
+    def read_raw(self, addr, code, length, pec):
+        dev = self.device(addr)
+        buf = bytearray(length)
+        saved = dev.pec
+        dev.pec = pec or saved
+        try:
+            ok = dev.read_into(code, buf, retries=1)
+        finally:
+            dev.pec = saved
+        return (ST_OK, bytes(buf)) if ok else (ST_ERROR, b"")
+
+    def handle(self, op, payload):
+        if op == OP_PING:
+            return ST_OK, b"PMBT"
+        if op in (OP_RAW_READ, OP_PEC_READ) and len(payload) == 3:
+            addr, code, length = payload
+            if not length:
+                return ST_BAD_REQUEST, b""
+            return self.read_raw(addr, code, length, op == OP_PEC_READ)
+        if op == OP_READ_CMD and len(payload) == 2:
+            addr, code = payload
+            cmd = BY_CODE[code]
+            if cmd is None or not cmd.size:
+                return ST_BAD_REQUEST, b""
+            buf = bytearray(cmd.size)
+            n = self.device(addr).read_command_into(cmd, buf)
+            return (ST_OK, bytes(buf[:n])) if n else (ST_ERROR, b"")
+        if op == OP_SNAPSHOT and len(payload) == 1:
+            reader = self.reader(payload[0])
+            reader.read_bus()
+            stamps = reader.stamps
+            skew = ticks_diff(stamps[-1], stamps[0]) if len(stamps) else 0
+            out = bytearray(struct.pack("<IB", skew, len(reader.cmds)))
+            for i in range(len(reader.cmds)):
+                n = reader.lengths[i]
+                out += bytes([reader.cmds[i].code, n])
+                out += reader.views[i][:n]
+            return ST_OK, bytes(out)
+        return ST_BAD_REQUEST, b""
+
+    def serve(self):
+        while True:
+            frame = self.read_frame()
+            if frame is None:
+                return
+            seq, op, payload = frame
+            if op == OP_EXIT:
+                self.reply(seq, ST_OK)
+                return
+            if payload is None:
+                self.reply(seq, ST_BAD_REQUEST)
+                continue
+            status, data = self.handle(op, payload)
+            self.reply(seq, status, data)
+            # SMBALERT# между кадрами: события попадают в журнал events без вывода текста
+            self.manager.service_alerts(announce=False)
@@ -0,0 +1,125 @@
+from array import array
+from commands import VOUT_MODE
+from decode import decode_value, vout_exponent
+from compat import ticks_us, ticks_diff, mem_alloc
+
+
+class Snapshot:
+    __slots__ = ("addr", "cmds", "values", "stamps", "t_start", "skew_us", "errors", "page")
+
+    def __init__(self, addr, cmds, values, stamps, t_start, skew_us, errors, page=None):
+        self.addr = addr
+        self.page = page
+        self.cmds = cmds
+        self.values = values
+        self.stamps = stamps
+        self.t_start = t_start
+        self.skew_us = skew_us
+        self.errors = errors
+
+    def value(self, cmd):
+        return self.values[self.cmds.index(cmd)]
+
+
+class SnapshotReader:
+    """
+    Читает весь набор команд подряд в заранее выделенный буфер,
+    декодирование выполняется только после завершения обмена по шине.
+    page - страница многоканального блока: команды читаются через PAGE_PLUS_READ
+    (page_plus=True) или после одной записи PAGE на весь набор.
+    """
+
+    def __init__(self, device, cmds, page=None, page_plus=True):
+        self.device = device
+        self.cmds = tuple(cmds)
+        self.page = page
+        self.page_plus = page_plus
+        self.mode = bytearray(1)  # VOUT_MODE страницы
+        self.mode_len = 0
+        self.offsets = []
+        offset = 0
+        for cmd in self.cmds:
+            self.offsets.append(offset)
+            offset += cmd.size
+        self.buf = bytearray(offset)
+        mv = memoryview(self.buf)
+        self.views = [mv[off:off + cmd.size] for off, cmd in zip(self.offsets, self.cmds)]
+        self.lengths = bytearray(len(self.cmds))
+        self.stamps = array("I", bytes(4 * len(self.cmds)))
+        # Прирост кучи (gc.mem_alloc) за фазу шины и за весь последний цикл
+        self.heap_bus = 0
+        self.heap_total = 0
+
+    def read_bus(self):
+        """Фаза шины: только транзакции в заранее выделенные буферы."""
+        device = self.device
+        cmds = self.cmds
+        views = self.views
+        lengths = self.lengths
+        stamps = self.stamps
+        page = self.page
+        if page is None:
+            for i in range(len(cmds)):
+                lengths[i] = device.read_command_into(cmds[i], views[i])
+                stamps[i] = ticks_us()
+            return
+        # У каждой страницы свой VOUT_MODE: кэш хранит его по (адрес, страница)
+        if not self.page_plus:
+            if not device.set_page(page):
+                for i in range(len(cmds)):
+                    lengths[i] = 0
+                    stamps[i] = ticks_us()
+                self.mode_len = 0
+                return
+            page = None
+        self.mode_len = device.read_command_into(VOUT_MODE, self.mode, page)
+        for i in range(len(cmds)):
+            lengths[i] = device.read_command_into(cmds[i], views[i], page)
+            stamps[i] = ticks_us()
+
+    def capture(self):
+        heap_start = mem_alloc()
+        device = self.device
+        cmds = self.cmds
+        views = self.views
+        lengths = self.lengths
+        stamps = self.stamps
+        # Экспонент нужен только для декодирования, берём его из кэша до начала опроса
+        mode = device.read_cached(VOUT_MODE.code, 1) if self.page is None else None
+        heap_bus = mem_alloc()
+        self.read_bus()
+        self.heap_bus = mem_alloc() - heap_bus
+        if self.page is not None and self.mode_len:
+            mode = self.mode
+
+        # --- Фаза декодирования ---
+        exponent = vout_exponent(mode[0]) if mode else None
+        values = []
+        errors = 0
+        for i, cmd in enumerate(cmds):
+            n = lengths[i]
+            if n:
+                values.append(decode_value(cmd, views[i][:n], exponent))
+            else:
+                values.append(None)
+                errors += 1
+        skew = ticks_diff(stamps[-1], stamps[0]) if stamps else 0
+        snap = Snapshot(device.addr, cmds, values, stamps[:], stamps[0] if stamps else 0, skew, errors,
+                        self.page)
+        self.heap_total = mem_alloc() - heap_start
+        return snap
+
+
+class PagedReader:
+    """
+    Опрос многоканального блока: команды сгруппированы по страницам,
+    на каждую страницу - свой SnapshotReader со своими буферами.
+    """
+
+    def __init__(self, device, pages, cmds, page_plus=True):
+        self.device = device
+        self.page_plus = page_plus
+        self.readers = [SnapshotReader(device, cmds, page, page_plus) for page in pages]
+
+    def capture(self):
+        return [reader.capture() for reader in self.readers]
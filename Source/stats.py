@@ -0,0 +1,99 @@
+from array import array
+from compat import ticks_us, ticks_diff
+
+NACK_ERRNOS = (5, 19)   # EIO, ENODEV: ведомый не ответил ACK
+
+# Поля машиночитаемого дампа (порядок значений в списке для каждой команды)
+DUMP_FIELDS = ("count", "errors", "retries", "nacks", "pec", "min_us", "avg_us", "max_us")
+
+
+def is_nack(exc):
+    return isinstance(exc, OSError) and exc.args and exc.args[0] in NACK_ERRNOS
+
+
+class BusStats:
+    """
+    Счётчики транзакций по кодам команд. Место выделяется только под коды,
+    которые блок действительно получал (slots: код -> индекс в массивах), -
+    около 26 байт на команду вместо массивов на все 256 кодов.
+    Запись уже встречавшегося кода не создаёт новых объектов.
+    """
+
+    def __init__(self):
+        self.slots = {}
+        self.codes = bytearray()
+        self.count = array("I")
+        self.errors = array("I")
+        self.retries = array("I")
+        self.nacks = array("I")
+        self.pec = array("I")
+        self.lat_sum = array("I")
+        self.lat_min = array("H")
+        self.lat_max = array("H")
+
+    def slot(self, code):
+        i = self.slots.get(code)
+        if i is not None:
+            return i
+        i = self.slots[code] = len(self.codes)
+        self.codes.append(code)
+        for arr in (self.count, self.errors, self.retries, self.nacks,
+                    self.pec, self.lat_sum, self.lat_max):
+            arr.append(0)
+        self.lat_min.append(0xFFFF)
+        return i
+
+    def reset(self):
+        self.__init__()
+
+    def merge(self, other):
+        """Добавляет счётчики other (тот же блок, опрошенный другим PMBusDevice)."""
+        for j, code in enumerate(other.codes):
+            i = self.slot(code)
+            for name in ("count", "errors", "retries", "nacks", "pec"):
+                getattr(self, name)[i] += getattr(other, name)[j]
+            self.lat_sum[i] = (self.lat_sum[i] + other.lat_sum[j]) & 0xFFFFFFFF
+            self.lat_min[i] = min(self.lat_min[i], other.lat_min[j])
+            self.lat_max[i] = max(self.lat_max[i], other.lat_max[j])
+
+    def record(self, code, t0, ok=True):
+        us = ticks_diff(ticks_us(), t0)
+        if us > 0xFFFF:
+            us = 0xFFFF
+        i = self.slot(code)
+        self.count[i] += 1
+        self.lat_sum[i] = (self.lat_sum[i] + us) & 0xFFFFFFFF
+        if us < self.lat_min[i]:
+            self.lat_min[i] = us
+        if us > self.lat_max[i]:
+            self.lat_max[i] = us
+        if not ok:
+            self.errors[i] += 1
+
+    def record_retry(self, code):
+        self.retries[self.slot(code)] += 1
+
+    def record_pec(self, code):
+        self.pec[self.slot(code)] += 1
+
+    def record_error(self, code, exc):
+        if is_nack(exc):
+            self.nacks[self.slot(code)] += 1
+
+    def row(self, code):
+        i = self.slots.get(code)
+        if i is None or not self.count[i]:
+            return None
+        count = self.count[i]
+        return (count, self.errors[i], self.retries[i], self.nacks[i],
+                self.pec[i], self.lat_min[i], self.lat_sum[i] // count,
+                self.lat_max[i])
+
+    def rows(self):
+        for code in sorted(self.codes):
+            row = self.row(code)
+            if row is not None:
+                yield code, row
+
+    def dump(self):
+        return {f"0x{code:02X}": list(row) for code, row in self.rows()}
@@ -0,0 +1,109 @@
+from commands import (STATUS_BYTE, STATUS_WORD, STATUS_VOUT, STATUS_IOUT, STATUS_INPUT,
+                      STATUS_TEMPERATURE, STATUS_FANS_1_2, STATUS_OTHER)
+
+# Таблицы битов: кортежи (маска, номер бита, описание) в порядке вывода
+STATUS_WORD_BITS = (
+    (1 << 15, 15, "VOUT"), (1 << 14, 14, "IOUT/POUT"), (1 << 13, 13, "INPUT"),
+    (1 << 12, 12, "MFR"), (1 << 11, 11, "POWER_GOOD#"), (1 << 10, 10, "FANS"),
+    (1 << 9, 9, "OTHER"), (1 << 8, 8, "UNKNOWN"),
+    (1 << 7, 7, "BUSY"), (1 << 6, 6, "OFF"), (1 << 5, 5, "VOUT_OV"), (1 << 4, 4, "IOUT_OC"),
+    (1 << 3, 3, "VIN_UV"), (1 << 2, 2, "TEMPERATURE"), (1 << 1, 1, "CML"),
+    (1 << 0, 0, "NONE OF THE ABOVE"),
+)
+STATUS_VOUT_BITS = (
+    (0x80, 7, "VOUT Over voltage Fault"), (0x40, 6, "VOUT Over voltage Warning"),
+    (0x20, 5, "VOUT Under voltage Warning"), (0x10, 4, "VOUT Under voltage Fault"),
+    (0x08, 3, "VOUT_MAX Warning"), (0x04, 2, "TON_MAX_FAULT"),
+    (0x02, 1, "TOFF_MAX Warning"), (0x01, 0, "VOUT Tracking Error"),
+)
+STATUS_IOUT_BITS = (
+    (0x80, 7, "IOUT Over current Fault"), (0x40, 6, "IOUT OC + LV Shutdown Fault"),
+    (0x20, 5, "IOUT Over current Warning"), (0x10, 4, "IOUT Undercurrent Fault"),
+    (0x08, 3, "Current Share Fault"), (0x04, 2, "Power Limiting"),
+    (0x02, 1, "POUT Overpower Fault"), (0x01, 0, "POUT Overpower Warning"),
+)
+STATUS_INPUT_BITS = (
+    (0x80, 7, "VIN Over voltage Fault"), (0x40, 6, "VIN Over voltage Warning"),
+    (0x20, 5, "VIN Under voltage Warning"), (0x10, 4, "VIN Under voltage Fault"),
+    (0x08, 3, "Unit Off - Low Input"), (0x04, 2, "IIN Over current Fault"),
+    (0x02, 1, "IIN Over current Warning"), (0x01, 0, "PIN Overpower Warning"),
+)
+STATUS_TEMPERATURE_BITS = (
+    (0x80, 7, "Over temperature Fault"), (0x40, 6, "Over temperature Warning"),
+    (0x20, 5, "Under temperature Warning"), (0x10, 4, "Under temperature Fault"),
+)
+STATUS_FANS_1_2_BITS = (
+    (0x80, 7, "Fan 1 Fault"), (0x40, 6, "Fan 2 Fault"), (0x20, 5, "Fan 1 Warning"),
+    (0x10, 4, "Fan 2 Warning"), (0x08, 3, "Fan 1 Speed Overridden"),
+    (0x04, 2, "Fan 2 Speed Overridden"), (0x02, 1, "Airflow Fault"), (0x01, 0, "Airflow Warning"),
+)
+STATUS_OTHER_BITS = (
+    (0x20, 5, "Input A Fuse Fault"), (0x10, 4, "Input B Fuse Fault"),
+    (0x08, 3, "Input A OR-ing Fault"), (0x04, 2, "Input B OR-ing Fault"),
+    (0x02, 1, "Output OR-ing Fault"),
+)
+
+# Полный список регистров для команды status
+STATUS_REGISTERS = (
+    (STATUS_WORD, STATUS_WORD_BITS),
+    (STATUS_VOUT, STATUS_VOUT_BITS),
+    (STATUS_IOUT, STATUS_IOUT_BITS),
+    (STATUS_INPUT, STATUS_INPUT_BITS),
+    (STATUS_TEMPERATURE, STATUS_TEMPERATURE_BITS),
+    (STATUS_FANS_1_2, STATUS_FANS_1_2_BITS),
+    (STATUS_OTHER, STATUS_OTHER_BITS),
+)
+
+# Дерево неисправностей: (суммарные биты STATUS_WORD, регистр, таблица битов).
+# В младшем байте (STATUS_BYTE) есть только VOUT_OV, IOUT_OC, VIN_UV и TEMPERATURE.
+FAULT_TREE = (
+    ((1 << 15) | (1 << 5), STATUS_VOUT, STATUS_VOUT_BITS),
+    ((1 << 14) | (1 << 4), STATUS_IOUT, STATUS_IOUT_BITS),
+    ((1 << 13) | (1 << 3), STATUS_INPUT, STATUS_INPUT_BITS),
+    (1 << 2, STATUS_TEMPERATURE, STATUS_TEMPERATURE_BITS),
+    (1 << 10, STATUS_FANS_1_2, STATUS_FANS_1_2_BITS),
+    (1 << 9, STATUS_OTHER, STATUS_OTHER_BITS),
+)
+
+# Суммарные биты, для которых нет отдельного регистра в дереве
+SUMMARY_ONLY_MASK = (1 << 12) | (1 << 11) | (1 << 8) | (1 << 7) | (1 << 6) | (1 << 1) | (1 << 0)
+
+
+NO_FAULTS = ()
+
+
+def register_value(data):
+    return data[0] if len(data) == 1 else (data[1] << 8 | data[0])
+
+
+def active_bits(cmd, value, bits, out):
+    for mask, bit, label in bits:
+        if value & mask:
+            out.append((cmd.name, bit, label))
+
+
+def read_fault_tree(device, use_word=True):
+    """
+    Читает STATUS_WORD (или STATUS_BYTE) и спускается только в те
+    регистры, суммарные биты которых установлены.
+    Возвращает список активных битов (регистр, бит, описание);
+    пустой кортеж - неисправностей нет, None - статус не прочитан.
+    Для исправного блока не создаёт объектов в куче.
+    """
+    summary = STATUS_WORD if use_word else STATUS_BYTE
+    buf = device.buffer(summary.size)
+    if not device.read_into(summary.code, buf):
+        return None
+    word = register_value(buf)
+    if not word:
+        return NO_FAULTS
+    faults = []
+    active_bits(summary, word & SUMMARY_ONLY_MASK, STATUS_WORD_BITS, faults)
+    sub = device.buffer(1)
+    for mask, cmd, bits in FAULT_TREE:
+        if word & mask:
+            if device.read_into(cmd.code, sub):
+                active_bits(cmd, sub[0], bits, faults)
+            else:
+                faults.append((cmd.name, -1, "[READ ERROR]"))
+    return faults